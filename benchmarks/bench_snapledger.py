@@ -0,0 +1,234 @@
+### Offline benchmark for the SnapLedger request path.
+###
+### Replays the recorded SSE payloads in benchmarks/fixtures through parsed_response_message,
+### drives cortex_agent_call / get_analyst_response / submit_feedback against a local stand-in
+### of the Cortex endpoints, and times computer_vision_prediction with a fake Predictor.
+###
+### Usage (from the repository root):
+###   python benchmarks/bench_snapledger.py --iterations 50 --first-byte-ms 300 --chunk-bytes 256
+###
+### Results are written to benchmarks/results/<release>-<timestamp>.json and compared with the
+### most recent earlier result file, so regressions show up between releases.
+
+import argparse, glob, io, json, os, platform, sys, time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stubs import (REPO_ROOT, FakePredictor, FakeSession, StubServer, StubSettings,
+                   install_stubs, load_config, load_fixtures)
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+def percentiles(samples):
+    """p50/p90/p95/p99/max of a list of seconds, reported in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+    return {"n": len(ordered), "p50": pick(0.50), "p90": pick(0.90), "p95": pick(0.95), "p99": pick(0.99),
+            "max": round(ordered[-1] * 1000, 3)}
+
+
+def chunked(body, size):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+class RecordingPlaceholder:
+    """Stands in for st.empty(); remembers when the first token was rendered."""
+
+    def __init__(self):
+        self.first_render = None
+        self.renders = 0
+
+    def markdown(self, *args, **kwargs):
+        self.renders += 1
+        if self.first_render is None:
+            self.first_render = time.perf_counter()
+
+    def empty(self):
+        pass
+
+
+def user_messages(text):
+    return [{"role": "user", "content": [{"type": "text", "text": text}]}]
+
+
+def bench_parse(app, iterations, chunk_bytes):
+    results = {}
+    for cortex_type in ("agent", "analyst"):
+        bodies = load_fixtures(cortex_type)
+        total_bytes = sum(len(body) for body in bodies) * iterations
+        samples = []
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for body in bodies:
+                chunks = chunked(body, chunk_bytes)
+                began = time.perf_counter()
+                app.parsed_response_message(chunks, cortex_type, "bench")
+                samples.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+        results[cortex_type] = {"latency_ms": percentiles(samples)
+                                , "mb_per_second": round(total_bytes / elapsed / 1e6, 3)}
+    return results
+
+
+def bench_agent(app, iterations):
+    ttft, total = [], []
+    for _ in range(iterations):
+        app.reset_session_state()
+        placeholder = RecordingPlaceholder()
+        began = time.perf_counter()
+        app.cortex_agent_call(user_messages("When did I last buy granola bars?"), placeholder=placeholder)
+        total.append(time.perf_counter() - began)
+        if placeholder.first_render is not None:
+            ttft.append(placeholder.first_render - began)
+    return {"time_to_first_token_ms": percentiles(ttft), "latency_ms": percentiles(total)}
+
+
+def bench_analyst(app, iterations):
+    samples = []
+    for _ in range(iterations):
+        began = time.perf_counter()
+        app.get_analyst_response(user_messages("What is the total expense per day?"))
+        samples.append(time.perf_counter() - began)
+    return {"latency_ms": percentiles(samples)}
+
+
+def bench_feedback(app, iterations):
+    samples = []
+    for i in range(iterations):
+        began = time.perf_counter()
+        app.submit_feedback(f"bench-{i}", True, "bench")
+        samples.append(time.perf_counter() - began)
+    return {"latency_ms": percentiles(samples)}
+
+
+def sample_image(seed):
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (3024, 4032), (240, 240, 235))
+    ImageDraw.Draw(image).rectangle((400 + seed % 7 * 40, 900, 2400, 3000), fill=(150, 90, 40))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def bench_vision(app, iterations):
+    from prediction_cache import PredictionCache
+    cold, warm = [], []
+    cache = PredictionCache()
+    image = sample_image(0)
+    app.computer_vision_prediction(image, api_key="bench-key", prediction_cache=cache)
+    for _ in range(iterations):
+        began = time.perf_counter()
+        app.computer_vision_prediction(image, api_key="bench-key", prediction_cache=PredictionCache())
+        cold.append(time.perf_counter() - began)
+
+        began = time.perf_counter()
+        app.computer_vision_prediction(image, api_key="bench-key", prediction_cache=cache)
+        warm.append(time.perf_counter() - began)
+    return {"cold_latency_ms": percentiles(cold), "warm_latency_ms": percentiles(warm)}
+
+
+def bench_turn(app, iterations):
+    """Image turn end to end: prediction (cold cache) followed by the streamed agent call."""
+    from prediction_cache import PredictionCache
+    image = sample_image(1)
+    samples = []
+    for _ in range(iterations):
+        app.reset_session_state()
+        began = time.perf_counter()
+        labels = app.computer_vision_prediction(image, api_key="bench-key", prediction_cache=PredictionCache())
+        question = f"When did I last buy this? ( for the item {labels[0]['item']} )" if labels else "When did I last buy this?"
+        app.cortex_agent_call(user_messages(question), placeholder=RecordingPlaceholder())
+        samples.append(time.perf_counter() - began)
+    return {"latency_ms": percentiles(samples)}
+
+
+def previous_result(current_path):
+    earlier = [path for path in sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json"))) if path != current_path]
+    return earlier[-1] if earlier else None
+
+
+def flatten(prefix, node, out):
+    for key, value in node.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flatten(name, value, out)
+        elif isinstance(value, (int, float)):
+            out[name] = value
+    return out
+
+
+def compare(current, baseline, threshold):
+    """Latency metrics (ms) that got slower, or throughput metrics that dropped, by more than `threshold`."""
+    now = flatten("", current["results"], {})
+    before = flatten("", baseline["results"], {})
+    regressions = []
+    for name, value in now.items():
+        if name not in before or not before[name] or name.endswith(".n"):
+            continue
+        change = (value - before[name]) / before[name]
+        higher_is_better = name.endswith("mb_per_second")
+        if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+            regressions.append((name, before[name], value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline SnapLedger benchmark.")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--first-byte-ms", type=float, default=300)
+    parser.add_argument("--chunk-bytes", type=int, default=256)
+    parser.add_argument("--chunk-delay-ms", type=float, default=5)
+    parser.add_argument("--predict-ms", type=float, default=800)
+    parser.add_argument("--query-ms", type=float, default=20)
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change reported as a regression.")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    config = load_config()
+    settings = StubSettings(first_byte_ms=args.first_byte_ms, chunk_bytes=args.chunk_bytes, chunk_delay_ms=args.chunk_delay_ms)
+
+    with StubServer(config, settings) as server:
+        app = install_stubs(FakeSession(server.host, query_latency_ms=args.query_ms), FakePredictor(latency_ms=args.predict_ms))
+        app.reset_session_state()
+
+        results = {
+            "parse": bench_parse(app, args.iterations, args.chunk_bytes),
+            "agent": bench_agent(app, args.iterations),
+            "analyst": bench_analyst(app, args.iterations),
+            "feedback": bench_feedback(app, args.iterations),
+            "vision": bench_vision(app, max(1, args.iterations // 3)),
+            "turn": bench_turn(app, max(1, args.iterations // 3)),
+        }
+
+    report = {
+        "release": config["release"]["version"],
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": vars(args),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+
+    path = os.path.join(RESULTS_DIR, f"{report['release']}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json")
+    baseline_path = previous_result(path)
+    if baseline_path:
+        with open(baseline_path, "r") as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        print(f"\nCompared with {os.path.basename(baseline_path)}: {len(regressions)} regression(s)")
+        for name, before, now, change in regressions:
+            print(f"  {name}: {before} -> {now} ({change:+.0%})")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nSaved {os.path.relpath(path, REPO_ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
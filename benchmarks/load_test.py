@@ -0,0 +1,225 @@
+### Load test: many concurrent SnapLedger sessions in one server process.
+###
+### Every virtual user is a Streamlit AppTest of streamlit/snapledger.py, so each step is a real
+### script rerun against the shared process-wide caches, session pool and HTTP pool. Users replay
+### scripted conversations mixing text questions, suggestion clicks, image uploads and feedback
+### submits, against the local stand-ins of stubs.py (Snowflake, Cortex, LandingAI) with
+### configurable latency. Concurrency is ramped level by level; each level reports throughput,
+### step latency percentiles, errors and RSS per session, and the report names the saturation
+### point: the last level before throughput stopped scaling or p95 exceeded the budget.
+###
+### Usage (from the repository root):
+###   python benchmarks/load_test.py --levels 1,2,4,8,16 --first-byte-ms 300 --predict-ms 800
+###
+### AppTest cannot attach files to st.chat_input, so image steps queue (text, [image bytes]) in
+### session state and a thin wrapper around st.chat_input returns it as the chat submission.
+
+import argparse, gc, json, os, platform, resource, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_snapledger import RESULTS_DIR, percentiles, sample_image
+from stubs import APP_DIR, FakePredictor, FakeSession, StubServer, StubSettings, install_stubs, load_config
+
+UPLOAD_KEY = "_load_test_upload"
+
+## Scripted conversations; virtual users take them round-robin.
+SCRIPTS = {
+    "text": [("ask", "When did I last buy granola bars?"), ("suggestion", None), ("feedback", None)],
+    "image": [("image", "When did I last buy this?"), ("ask", "How much did I spend on it in total?")],
+    "starter": [("starter", None), ("ask", "Which store do I buy oatmeal at?"), ("feedback", None)],
+}
+
+
+class UploadPrompt(dict):
+    """What st.chat_input returns for a submission with attachments: text plus files."""
+
+    def __init__(self, text, files):
+        super().__init__(text=text, files=files)
+        self.text = text
+
+
+def install_upload_hook():
+    """Let a session-state entry stand in for files attached to the chat input."""
+    import streamlit as st
+    chat_input = st.chat_input
+
+    def scripted_chat_input(*args, **kwargs):
+        value = chat_input(*args, **kwargs)
+        upload = st.session_state.pop(UPLOAD_KEY, None)
+        return value if upload is None else UploadPrompt(*upload)
+
+    st.chat_input = scripted_chat_input
+
+
+def rss_mb():
+    """Resident set size of this process (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def find_button(at, prefix=None, label=None):
+    """Last button whose key starts with `prefix` or whose label is `label`, or None."""
+    matches = [button for button in at.button
+               if (prefix and (button.key or "").startswith(prefix)) or (label and button.label == label)]
+    return matches[-1] if matches else None
+
+
+class VirtualUser:
+    """One browser session replaying a scripted conversation."""
+
+    def __init__(self, user_id, script_name, image, distinct_questions, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.user_id = user_id
+        self.script_name = script_name
+        self.image = image
+        self.distinct_questions = distinct_questions
+        self.at = AppTest.from_file(os.path.join(APP_DIR, "snapledger.py"), default_timeout=timeout)
+        self.samples = []       # (step kind, seconds, ok)
+
+    def question(self, text):
+        # Distinct questions keep the answer cache from serving every user after the first.
+        return f"{text} (user {self.user_id})" if self.distinct_questions else text
+
+    def step(self, kind, text):
+        at = self.at
+        if kind == "ask":
+            action = at.chat_input[0].set_value(self.question(text))
+        elif kind == "image":
+            at.session_state[UPLOAD_KEY] = (self.question(text), [self.image])
+            action = at.chat_input[0]
+        else:
+            button = find_button(at, prefix=f"{kind}_") if kind != "feedback" else find_button(at, label="Submit")
+            action = button.click() if button is not None else None
+        if action is None:
+            # Every scripted answer renders suggestion / starter / feedback buttons, so a missing one is
+            # an app regression: counted as an error (and listed under "missing"), not silently skipped.
+            self.samples.append((kind, None, False))
+            return
+
+        began = time.perf_counter()
+        action.run()
+        self.samples.append((kind, time.perf_counter() - began, not at.exception))
+
+    def run(self):
+        at = self.at
+        began = time.perf_counter()
+        at.run()
+        self.samples.append(("page_load", time.perf_counter() - began, not at.exception))
+        api_key = next((each for each in at.text_input if "API Key" in each.label), None)
+        if api_key is not None:
+            api_key.set_value("bench-key")
+        for kind, text in SCRIPTS[self.script_name]:
+            self.step(kind, text)
+        return self
+
+
+def run_level(users, args, images):
+    """Run `users` concurrent virtual users once; returns the level's metrics."""
+    gc.collect()
+    rss_before = rss_mb()
+    scripts = list(SCRIPTS)
+    virtual_users = [VirtualUser(i, scripts[i % len(scripts)], images[i % len(images)]
+                                 , not args.repeat_questions, args.step_timeout) for i in range(users)]
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        finished = list(pool.map(VirtualUser.run, virtual_users))
+    elapsed = time.perf_counter() - began
+    # Sessions are still referenced here, so their state is part of the RSS.
+    rss_after = rss_mb()
+
+    samples = [sample for user in finished for sample in user.samples]
+    timed = [seconds for kind, seconds, ok in samples if ok and kind != "page_load"]
+    by_kind = {}
+    for kind, seconds, ok in samples:
+        if ok:
+            by_kind.setdefault(kind, []).append(seconds)
+    return {"users": users
+            , "elapsed_seconds": round(elapsed, 3)
+            , "steps_per_second": round(len(timed) / elapsed, 3) if elapsed else None
+            , "errors": sum(1 for _, _, ok in samples if not ok)
+            , "missing": {kind: sum(1 for each, seconds, _ in samples if each == kind and seconds is None)
+                          for kind in {kind for kind, seconds, _ in samples if seconds is None}}
+            , "latency_ms": percentiles(timed)
+            , "steps": {kind: percentiles(seconds) for kind, seconds in by_kind.items()}
+            , "rss_mb": round(rss_after, 1)
+            , "rss_per_session_mb": round(max(0.0, rss_after - rss_before) / users, 2)}
+
+
+def saturation_point(levels, min_gain, p95_budget_ms):
+    """Last level before throughput gained less than `min_gain` or p95 exceeded the budget."""
+    for previous, level in zip(levels, levels[1:]):
+        if previous["steps_per_second"] and level["steps_per_second"] < previous["steps_per_second"] * (1 + min_gain):
+            return {"users": previous["users"], "reason": "throughput stopped scaling"}
+        if level["latency_ms"].get("p95", 0) > p95_budget_ms:
+            return {"users": previous["users"], "reason": f"p95 above {p95_budget_ms} ms"}
+    return {"users": levels[-1]["users"] if levels else None, "reason": "not reached"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of SnapLedger.")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Comma-separated concurrent session counts.")
+    parser.add_argument("--first-byte-ms", type=float, default=300)
+    parser.add_argument("--chunk-bytes", type=int, default=256)
+    parser.add_argument("--chunk-delay-ms", type=float, default=5)
+    parser.add_argument("--predict-ms", type=float, default=800)
+    parser.add_argument("--query-ms", type=float, default=20)
+    parser.add_argument("--step-timeout", type=float, default=120, help="Seconds one script rerun may take.")
+    parser.add_argument("--min-gain", type=float, default=0.10, help="Throughput gain per level that still counts as scaling.")
+    parser.add_argument("--p95-budget-ms", type=float, default=5000)
+    parser.add_argument("--repeat-questions", action="store_true", help="Every user asks the same questions (answer cache hits).")
+    parser.add_argument("--save", action="store_true", help="Write the report to benchmarks/results/load/.")
+    args = parser.parse_args()
+
+    config = load_config()
+    settings = StubSettings(first_byte_ms=args.first_byte_ms, chunk_bytes=args.chunk_bytes, chunk_delay_ms=args.chunk_delay_ms)
+    levels = [int(each) for each in args.levels.split(",") if each.strip()]
+    images = [sample_image(seed) for seed in range(4)]
+
+    with StubServer(config, settings) as server:
+        install_stubs(FakeSession(server.host, query_latency_ms=args.query_ms), FakePredictor(latency_ms=args.predict_ms))
+        install_upload_hook()
+        # One unrecorded session first: imports and the process-wide caches are not per-session cost.
+        VirtualUser(-1, "text", images[0], True, args.step_timeout).run()
+        gc.collect()
+        baseline_rss = rss_mb()
+        results = []
+        for users in levels:
+            results.append(run_level(users, args, images))
+            level = results[-1]
+            print(f"{users:>4} sessions: {level['steps_per_second']} steps/s, p95 {level['latency_ms'].get('p95')} ms"
+                  f", {level['errors']} errors, {level['rss_per_session_mb']} MB/session"
+                  + (f", missing steps {level['missing']}" if level["missing"] else ""), file=sys.stderr, flush=True)
+
+    report = {
+        "release": config["release"]["version"],
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "threads": threading.active_count(),
+        "settings": vars(args),
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "levels": results,
+        "saturation": saturation_point(results, args.min_gain, args.p95_budget_ms),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        directory = os.path.join(RESULTS_DIR, "load")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{report['release']}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json")
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nSaved {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+### Local stand-ins for Snowflake, the Cortex REST endpoints and LandingAI, so the app code in
+### streamlit/ can be exercised and timed without a live account or API key.
+
+import glob, http.server, json, os, random, sys, threading, time
+from types import SimpleNamespace
+import pandas as pd
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(REPO_ROOT, "streamlit")
+FIXTURE_DIR = os.path.join(REPO_ROOT, "benchmarks", "fixtures")
+BANNER_PATH = os.path.join(REPO_ROOT, "src", "dbscripts", "stages", "images", "snapledger_banner.jpg")
+SEMANTIC_PATH = os.path.join(REPO_ROOT, "streamlit", "semantic_analyst_file.yaml")
+
+
+def load_config():
+    with open(os.path.join(APP_DIR, "config.yaml"), "r") as file:
+        return yaml.safe_load(file)
+
+
+def load_fixtures(prefix):
+    """Recorded SSE bodies: every fixtures/<prefix>*.sse file, as bytes."""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, f"{prefix}*.sse"))):
+        with open(path, "rb") as file:
+            fixtures.append(file.read())
+    return fixtures
+
+
+### Cortex stand-in server
+class StubSettings:
+    """Latency shape of the stand-in server; mutable while the server runs."""
+
+    def __init__(self, first_byte_ms=300, chunk_bytes=256, chunk_delay_ms=5, jitter=0.1):
+        self.first_byte_ms = first_byte_ms
+        self.chunk_bytes = chunk_bytes
+        self.chunk_delay_ms = chunk_delay_ms
+        self.jitter = jitter
+
+    def sleep_ms(self, ms):
+        if ms > 0:
+            time.sleep(ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+
+def make_handler(config, settings, agent_bodies, analyst_bodies):
+    endpoints = config["endpoint"]
+
+    class CortexStubHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _stream(self, body):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            settings.sleep_ms(settings.first_byte_ms)
+            for start in range(0, len(body), settings.chunk_bytes):
+                chunk = body[start:start + settings.chunk_bytes]
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+                settings.sleep_ms(settings.chunk_delay_ms)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_POST(self):
+            self._read_body()
+            if self.path == endpoints["cortex_agent"]:
+                self._stream(random.choice(agent_bodies))
+            elif self.path == endpoints["cortex_analyst_message"]:
+                self._stream(random.choice(analyst_bodies))
+            elif self.path == endpoints["cortex_analyst_feedback"]:
+                settings.sleep_ms(settings.first_byte_ms / 3)
+                payload = b"{}"
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            else:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+    return CortexStubHandler
+
+
+class StubServer:
+    """Threaded local HTTP server mimicking the config.yaml Cortex endpoints."""
+
+    def __init__(self, config, settings=None, port=0):
+        self.settings = settings or StubSettings()
+        handler = make_handler(config, self.settings, load_fixtures("agent"), load_fixtures("analyst"))
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def host(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+### Snowpark stand-in
+def sample_tables():
+    transactions = pd.DataFrame({
+        "_ID": [1, 2, 3, 4, 5, 6],
+        "TRANSACTION_TIMESTAMP": pd.to_datetime(["2025-03-15 09:23:45", "2025-03-16 11:45:12", "2025-03-17 14:30:22",
+                                                 "2025-03-18 16:18:37", "2025-03-19 08:12:53", "2025-03-20 10:05:41"]),
+        "MERCHANT_ID": [1, 2, 3, 4, 1, 2],
+        "MERCHANT_NAME": ["Loblaws Store #1234", "Metro Store #9876", "Costco Store #4567",
+                          "Walmart Store #7890", "Loblaws Store #1234", "Metro Store #9876"],
+        "PRODUCT_ID": [1, 2, 3, 4, 2, 1],
+        "ITEM": ["Granola bar", "Oatmeal", "Goldfish cracker", "Pez candy", "Oatmeal", "Granola bar"],
+        "AMOUNT": [3.99, 4.49, 8.99, 1.99, 4.29, 3.79],
+        "_LOAD_TS": pd.Timestamp("2025-04-01"),
+    })
+    website_images = pd.DataFrame({
+        "_ID": [1], "_LOAD_TS": [pd.Timestamp("2025-04-01")], "IMAGE_NAME": ["snapledger_banner.jpg"],
+        "RELATIVE_PATH": ["BANNER/snapledger_banner.jpg"], "DESCRIPTION": ["BANNER"], "SIZE": [1],
+    })
+    products = pd.DataFrame({
+        "_ID": [1, 2, 3, 4], "_LOAD_TS": [pd.Timestamp("2025-04-01")] * 4,
+        "PRODUCT_NAME": ["Granola bar", "Oatmeal", "Goldfish cracker", "Pez candy"],
+    })
+    return {"IMG_RECG.TRANSACTION": transactions, "IMG_RECG.WEBSITE_IMAGES": website_images, "IMG_RECG.DIM_PRODUCT": products}
+
+
+class FakeDataFrame:
+    def __init__(self, frame, latency_ms=0):
+        self.frame = frame
+        self.latency_ms = latency_ms
+
+    def _wait(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def collect(self, *args, **kwargs):
+        self._wait()
+        return [tuple(row) for row in self.frame.itertuples(index=False)]
+
+    def to_pandas(self, *args, **kwargs):
+        self._wait()
+        return self.frame.copy()
+
+    def limit(self, n, *args, **kwargs):
+        return FakeDataFrame(self.frame.head(n), self.latency_ms)
+
+    def _batches(self):
+        self._wait()
+        for start in range(0, len(self.frame), 1000):
+            yield self.frame.iloc[start:start + 1000].reset_index(drop=True)
+
+    def to_pandas_batches(self, *args, block=True, **kwargs):
+        if block:
+            return self._batches()
+        return FakeAsyncJob(self._batches, self.latency_ms)
+
+
+class FakeAsyncJob:
+    """Snowpark AsyncJob stand-in: done once the query latency has elapsed."""
+
+    def __init__(self, produce, latency_ms=0):
+        self.produce = produce
+        self.ready_at = time.monotonic() + latency_ms / 1000
+        self.cancelled = False
+
+    def is_done(self):
+        return self.cancelled or time.monotonic() >= self.ready_at
+
+    def cancel(self):
+        self.cancelled = True
+
+    def result(self, *args, **kwargs):
+        return self.produce()
+
+
+class FakeSession:
+    """Just enough of snowflake.snowpark.Session for the app code paths under benchmark."""
+
+    def __init__(self, host, token="bench-token", query_latency_ms=20, tables=None):
+        self.tables = tables or sample_tables()
+        self.query_latency_ms = query_latency_ms
+        self.connection = SimpleNamespace(host=host, rest=SimpleNamespace(token=token))
+        self.file = SimpleNamespace(get_stream=lambda path, **kwargs: open(SEMANTIC_PATH if path.endswith(".yaml") else BANNER_PATH, "rb"))
+        self.queries = []
+
+    def table(self, name):
+        return FakeDataFrame(self.tables[name], self.query_latency_ms)
+
+    def sql(self, query, params=None):
+        self.queries.append(query)
+        lowered = query.strip().lower()
+        for name, frame in self.tables.items():
+            if lowered.startswith("select max(_id)") and name.lower() in lowered:
+                watermark = pd.DataFrame([[frame["_ID"].max(), len(frame), frame["_LOAD_TS"].max()]])
+                return FakeDataFrame(watermark, self.query_latency_ms)
+        if lowered.startswith("list @"):
+            listing = pd.DataFrame([[query.split("@", 1)[1], 1, "bench-semantic-md5", "2025-04-01"]])
+            return FakeDataFrame(listing, self.query_latency_ms)
+        if lowered.startswith("insert"):
+            return FakeDataFrame(pd.DataFrame([[1]]), self.query_latency_ms)
+        return FakeDataFrame(self.tables["IMG_RECG.TRANSACTION"], self.query_latency_ms)
+
+
+class FakeBuilder:
+    def __init__(self, session):
+        self.session = session
+
+    def configs(self, *args, **kwargs):
+        return self
+
+    def getOrCreate(self):
+        return self.session
+
+    create = getOrCreate
+
+
+### LandingAI stand-in
+class FakePredictor:
+    """Predictor with a fixed latency that returns detections like the real ObjectDetectionPrediction list."""
+
+    def __init__(self, latency_ms=800, labels=("Granola bar",)):
+        self.latency_ms = latency_ms
+        self.labels = labels
+        self.calls = 0
+
+    def predict(self, image, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        return [SimpleNamespace(label_name=label, score=0.9) for label in self.labels]
+
+    def predict_bytes(self, data, **kwargs):
+        return self.predict(data, **kwargs)
+
+
+def install_stubs(session, predictor):
+    """
+    Point streamlit/ at the stand-ins, then import and return the snapledger module.
+    Must be called before anything imports snapledger.
+    """
+    import streamlit as st
+    from snowflake.snowpark import Session
+
+    os.chdir(REPO_ROOT)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+
+    st.secrets = {"connections": {"snowflake": {}}, "LandingAI_key": "bench-key"}
+    Session.builder = FakeBuilder(session)
+
+    import api_clients
+    api_clients.get_predictor = lambda endpoint_id, api_key: predictor
+
+    import snapledger
+    return snapledger
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS IMG_RECG.ANSWER_CACHE
+(
+    _ID INTEGER AUTOINCREMENT ORDER
+    , _LOAD_TS TIMESTAMP_NTZ DEFAULT SYSDATE()
+    , ANSWER_KEY VARCHAR
+    , REQUEST_ID VARCHAR
+    , RESPONSE VARIANT
+    , PRIMARY KEY (_ID)
+);
\ No newline at end of file
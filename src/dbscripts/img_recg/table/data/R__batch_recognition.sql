@@ -0,0 +1,17 @@
+CREATE TABLE IF NOT EXISTS IMG_RECG.BATCH_RECOGNITION
+(
+    _ID INTEGER AUTOINCREMENT ORDER
+    , _LOAD_TS TIMESTAMP_NTZ DEFAULT SYSDATE()
+    , BATCH_ID VARCHAR
+    , IMAGE_NAME VARCHAR
+    , STATUS VARCHAR
+    , ERROR VARCHAR
+    , LABEL VARCHAR
+    , PRODUCT_ID NUMBER
+    , PRODUCT_NAME VARCHAR
+    , MATCH_CONFIDENCE NUMBER(38,3)
+    , LAST_PURCHASE_TS TIMESTAMP_NTZ
+    , LAST_MERCHANT VARCHAR
+    , LAST_AMOUNT NUMBER(38,2)
+    , PRIMARY KEY (_ID)
+);
\ No newline at end of file
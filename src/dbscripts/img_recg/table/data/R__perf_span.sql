@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS IMG_RECG.PERF_SPAN
+(
+    _ID INTEGER AUTOINCREMENT ORDER
+    , _LOAD_TS TIMESTAMP_NTZ DEFAULT SYSDATE()
+    , REQUEST_ID VARCHAR
+    , SPAN_NAME VARCHAR
+    , STARTED_AT TIMESTAMP_NTZ
+    , DURATION_MS NUMBER(38,3)
+    , PRIMARY KEY (_ID)
+);
\ No newline at end of file
@@ -0,0 +1 @@
+ALTER TABLE IF EXISTS IMG_RECG.CHAT_MESSAGE ADD COLUMN IF NOT EXISTS SOURCE_REQUEST_ID VARCHAR;
\ No newline at end of file
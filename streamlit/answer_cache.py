@@ -0,0 +1,93 @@
+### Cache of agent answers to repeated questions, shared by every session.
+### Answers are keyed by the normalized question text, the version of the semantic model file and
+### the TRANSACTION watermark, so a new semantic YAML or new transactions simply stop matching.
+### Optionally answers are also persisted to IMG_RECG.ANSWER_CACHE (through the log sink) and read
+### back from there when the in-memory copy is missing, e.g. after a restart.
+
+import hashlib, json, re, threading, time
+from collections import OrderedDict
+import streamlit as st
+
+ANSWER_TABLE = "IMG_RECG.ANSWER_CACHE"
+
+_MARKUP = re.compile(r"\*\*:\w+\[(.*?)\]\*\*")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_question(text):
+    """Lower-cased question without markdown colouring, punctuation or repeated whitespace."""
+    text = _MARKUP.sub(r"\1", text)
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """LRU of rebuilt agent responses with TTL, optionally backed by a Snowflake table."""
+
+    def __init__(self, session_provider, log_sink=None, max_entries=256, ttl_seconds=86400, persist=False):
+        self.session_provider = session_provider
+        self.log_sink = log_sink
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.persist = persist and log_sink is not None
+        self.entries = OrderedDict()   # key -> {"response", "request_id", "created"}
+        self.stats = {"hits": 0, "table_hits": 0, "misses": 0, "stores": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question, semantic_version, watermark):
+        raw = json.dumps([normalize_question(question), semantic_version, str(watermark)])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        """Cached {"response", "request_id"} for `key`, or None."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry["created"] >= self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+        entry = self._read_table(key) if self.persist else None
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["table_hits"] += 1
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, response, request_id):
+        entry = {"response": response, "request_id": request_id, "created": time.monotonic()}
+        self._remember(key, entry)
+        self.stats["stores"] += 1
+        if self.persist:
+            self.log_sink.write(ANSWER_TABLE, {"ANSWER_KEY": key, "REQUEST_ID": request_id, "RESPONSE": response})
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _read_table(self, key):
+        try:
+            rows = self.session_provider().sql(
+                f"select RESPONSE, REQUEST_ID from {ANSWER_TABLE} "
+                f"where ANSWER_KEY = ? and _LOAD_TS >= dateadd(second, ?, sysdate()) "
+                f"order by _LOAD_TS desc limit 1", params=[key, -int(self.ttl)]).collect()
+        except Exception:
+            return None
+        if not rows:
+            return None
+        return {"response": json.loads(rows[0][0]), "request_id": rows[0][1], "created": time.monotonic()}
+
+
+@st.cache_resource(show_spinner=False)
+def get_answer_cache(_session_provider, _log_sink=None, max_entries=256, ttl_seconds=86400, persist=False, **_):
+    """One AnswerCache per process, shared by every session."""
+    return AnswerCache(_session_provider, _log_sink, max_entries=max_entries, ttl_seconds=ttl_seconds, persist=persist)
+
@@ -0,0 +1,95 @@
+### Shared outbound API clients.
+### One keep-alive requests.Session (with a sized connection pool) per host, and one LandingAI
+### Predictor per (endpoint_id, api_key), so a turn no longer pays a fresh TCP+TLS handshake.
+### REST calls go through resilience.call_http: timeouts, retries and a per-endpoint breaker.
+
+import threading
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from landingai.exceptions import InternalServerError, RateLimitExceededError, ServiceUnavailableError
+from landingai.predict import Predictor
+from landingai.predict.cloud import _CloudPredictionExtractor, get_cloudinference_prediction
+from resilience import TRANSIENT_ERRORS, call_http, request_timeout
+
+## Defaults, overridable through configure_http_pool() with the `http` section of config.yaml.
+POOL_SETTINGS = {"pool_connections": 4, "pool_maxsize": 32, "max_predictors": 64}
+
+_http_sessions = {}
+_predictors = OrderedDict()
+_lock = threading.Lock()
+
+
+def configure_http_pool(pool_connections=4, pool_maxsize=32, max_predictors=64, **_):
+    """Set the pool sizes used for clients created from now on."""
+    POOL_SETTINGS.update(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_predictors=max_predictors)
+
+
+def get_http_session(host):
+    """Return the process-wide keep-alive session for `host`."""
+    with _lock:
+        http = _http_sessions.get(host)
+        if http is None:
+            http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SETTINGS["pool_connections"]
+                                  , pool_maxsize=POOL_SETTINGS["pool_maxsize"]
+                                  , pool_block=False)
+            http.mount("https://", adapter)
+            http.mount("http://", adapter)
+            _http_sessions[host] = http
+        return http
+
+
+def snowflake_headers(token):
+    return {
+        "Authorization": f'Snowflake Token="{token}"',
+        "Content-Type": "application/json",
+    }
+
+
+def post_json(host, path, body, token, stream=False):
+    """
+    POST a JSON body to a Snowflake REST endpoint over the pooled session for `host`.
+    `host` may carry its own scheme (e.g. "http://127.0.0.1:8765" for the benchmark stand-in server).
+    429 / 5xx answers and transport errors are retried; raises CircuitOpenError while `path` is failing.
+    """
+    base_url = host if "://" in host else f"https://{host}"
+    return call_http(path, lambda: get_http_session(host).post(
+        url=f"{base_url}{path}",
+        json=body,
+        headers=snowflake_headers(token),
+        stream=stream,
+        timeout=request_timeout(),
+    ))
+
+
+## LandingAI prediction errors worth retrying (429 / 5xx), on top of timeouts and transport errors.
+LANDINGAI_TRANSIENT_ERRORS = TRANSIENT_ERRORS + (RateLimitExceededError, ServiceUnavailableError, InternalServerError)
+
+
+class JpegPredictor(Predictor):
+    """
+    LandingAI Predictor that uploads already-encoded image bytes as they are.
+    Predictor.predict re-encodes a PIL image at the library's default JPEG quality, so the size
+    and quality chosen in image_prep would not be what goes over the wire.
+    """
+
+    def predict_bytes(self, data):
+        preds, self._performance_metrics = get_cloudinference_prediction(
+            self._session, self._url, {"file": data}, {"endpoint_id": self._endpoint_id}, _CloudPredictionExtractor)
+        return preds
+
+
+def get_predictor(endpoint_id, api_key):
+    """Return a cached LandingAI JpegPredictor for (endpoint_id, api_key)."""
+    key = (endpoint_id, api_key)
+    with _lock:
+        predictor = _predictors.get(key)
+        if predictor is None:
+            predictor = JpegPredictor(endpoint_id, api_key=api_key)
+            _predictors[key] = predictor
+            while len(_predictors) > POOL_SETTINGS["max_predictors"]:
+                _predictors.popitem(last=False)
+        else:
+            _predictors.move_to_end(key)
+        return predictor
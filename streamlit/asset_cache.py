@@ -0,0 +1,178 @@
+### Local cache of static @IMG_RECG.INSTAGE assets: banner images and the semantic model YAML.
+### Every asset is served from memory, or from disk after a restart, and re-validated against the
+### md5 / last_modified of `LIST @stage` at most every `refresh_interval_seconds`. Validation and
+### re-downloads run in a background thread, so only the very first fetch of an asset waits on the
+### stage. Disk copies carry a sha256 of their content and are discarded when it does not match.
+
+import hashlib, json, os, threading, time
+import yaml
+import streamlit as st
+
+
+def parse_semantic_model(data):
+    """Parsed semantic model YAML; raises ValueError when it lacks a name or complete base tables."""
+    model = yaml.safe_load(data)
+    if not isinstance(model, dict) or not model.get("name") or not isinstance(model.get("tables"), list):
+        raise ValueError("semantic model needs a name and a list of tables")
+    for table in model["tables"]:
+        base_table = table.get("base_table") or {}
+        if not table.get("name") or not all(base_table.get(part) for part in ("database", "schema", "table")):
+            raise ValueError(f"semantic model table {table.get('name')!r} has an incomplete base_table")
+    return model
+
+
+def onboarding_questions(model):
+    """Verified questions flagged `use_as_onboarding_question` in a parsed semantic model."""
+    return [query["question"] for query in model.get("verified_queries") or []
+            if query.get("use_as_onboarding_question") and query.get("question")]
+
+
+class StageAsset:
+    """One staged file, kept in memory and on disk with the LIST signature it was downloaded at."""
+
+    def __init__(self, session_provider, stage_path, disk_dir, refresh_interval_seconds=300, fallback_path=""):
+        self.session_provider = session_provider
+        self.stage_path = stage_path.lstrip("@")
+        self.refresh_interval = refresh_interval_seconds
+        self.fallback_path = fallback_path
+        self.disk_path = os.path.join(disk_dir, "".join(ch if ch.isalnum() or ch in "._-" else "_" for ch in self.stage_path))
+        self.data = None
+        self.digest = None        # sha256 of data
+        self.signature = None     # {"md5", "last_modified"} from LIST
+        self.checked_at = 0.0
+        self.stats = {"memory_hits": 0, "disk_loads": 0, "downloads": 0, "validations": 0, "refresh_errors": 0}
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _remote_signature(self):
+        rows = self.session_provider().sql(f"list @{self.stage_path}").collect()
+        # LIST matches by prefix; prefer the row of exactly this file.
+        suffix = self.stage_path.split("/", 1)[-1]
+        row = next((row for row in rows if str(row[0]).endswith(suffix)), rows[0] if rows else None)
+        if row is None:
+            raise FileNotFoundError(f"@{self.stage_path}")
+        return {"md5": row[2], "last_modified": str(row[3])}
+
+    def _store(self, data, signature):
+        self.data, self.digest, self.signature = data, hashlib.sha256(data).hexdigest(), signature
+        try:
+            os.makedirs(os.path.dirname(self.disk_path) or ".", exist_ok=True)
+            with open(self.disk_path + ".tmp", "wb") as file:
+                file.write(data)
+            os.replace(self.disk_path + ".tmp", self.disk_path)
+            with open(self.disk_path + ".json", "w") as file:
+                json.dump({"signature": signature, "sha256": self.digest}, file)
+        except OSError:
+            pass
+
+    def _load_disk(self):
+        try:
+            with open(self.disk_path, "rb") as file:
+                data = file.read()
+            with open(self.disk_path + ".json", "r") as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if hashlib.sha256(data).hexdigest() != meta.get("sha256"):
+            return False
+        self.data, self.digest, self.signature = data, meta["sha256"], meta.get("signature")
+        return True
+
+    def _download(self, signature):
+        data = self.session_provider().file.get_stream(f"@{self.stage_path}", decompress=False).read()
+        self._store(data, signature)
+        self.stats["downloads"] += 1
+
+    def _refresh(self):
+        """Background validation: re-download only when the staged file changed."""
+        try:
+            signature = self._remote_signature()
+            self.stats["validations"] += 1
+            if signature != self.signature:
+                self._download(signature)
+        except Exception:
+            self.stats["refresh_errors"] += 1
+        finally:
+            self.checked_at = time.monotonic()
+            self._refreshing = False
+
+    def get(self):
+        """The asset bytes; the first call per process may download, later ones never wait on the stage."""
+        with self._lock:
+            if self.data is None and self._load_disk():
+                # Served from disk right away; checked_at stays 0 so it is validated in the background.
+                self.stats["disk_loads"] += 1
+            if self.data is None:
+                try:
+                    self._download(self._remote_signature())
+                except Exception:
+                    if not self.fallback_path:
+                        raise
+                    with open(self.fallback_path, "rb") as file:
+                        self._store(file.read(), None)
+                self.checked_at = time.monotonic()
+                return self.data
+
+            self.stats["memory_hits"] += 1
+            if not self._refreshing and time.monotonic() - self.checked_at >= self.refresh_interval:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+            return self.data
+
+
+class AssetCache:
+    """The staged assets of one app process, plus parsed copies of the semantic model."""
+
+    def __init__(self, session_provider, disk_dir=".cache/assets", refresh_interval_seconds=300):
+        self.session_provider = session_provider
+        self.disk_dir = disk_dir
+        self.refresh_interval = refresh_interval_seconds
+        self.assets = {}
+        self.models = {}          # stage path -> (digest, parsed model)
+        self._lock = threading.Lock()
+
+    def asset(self, stage_path, fallback_path=""):
+        with self._lock:
+            if stage_path not in self.assets:
+                self.assets[stage_path] = StageAsset(self.session_provider, stage_path, self.disk_dir
+                                                     , self.refresh_interval, fallback_path)
+            return self.assets[stage_path]
+
+    def get(self, stage_path, fallback_path=""):
+        return self.asset(stage_path, fallback_path).get()
+
+    def version(self, stage_path, fallback_path=""):
+        """Content hash of the asset; changes exactly when its bytes change."""
+        asset = self.asset(stage_path, fallback_path)
+        asset.get()
+        return asset.digest
+
+    def semantic_model(self, stage_path, fallback_path=""):
+        """Parsed, validated semantic model; an invalid new upload keeps serving the last valid one."""
+        asset = self.asset(stage_path, fallback_path)
+        data = asset.get()
+        digest, model = self.models.get(stage_path, (None, None))
+        if digest != asset.digest:
+            try:
+                model = parse_semantic_model(data)
+            except (ValueError, yaml.YAMLError):
+                if model is None:
+                    raise
+            self.models[stage_path] = (asset.digest, model)
+        return model
+
+    def stats(self):
+        return {path: dict(asset.stats, bytes=len(asset.data or b"")) for path, asset in self.assets.items()}
+
+
+@st.cache_resource(show_spinner=False)
+def get_asset_cache(_session_provider, disk_dir=".cache/assets", refresh_interval_seconds=300):
+    """One AssetCache per process; the session provider is not part of the cache key."""
+    return AssetCache(_session_provider, disk_dir, refresh_interval_seconds)
+
+
+def get_banner_image(reference_data, asset_cache, images_path="@IMG_RECG.INSTAGE"):
+    """Banner bytes: WEBSITE_IMAGES names the file, the asset cache serves it."""
+    website_imgs = reference_data.get("IMG_RECG.WEBSITE_IMAGES")
+    banner_loc = website_imgs[website_imgs["DESCRIPTION"]=="BANNER"]["IMAGE_NAME"].values[0]
+    return asset_cache.get(f"{images_path}/BANNER/{banner_loc}")
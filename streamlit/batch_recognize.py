@@ -0,0 +1,233 @@
+### Headless bulk image recognition and transaction matching.
+###
+### Images from a local directory or a stage path are decoded and preprocessed in a process pool,
+### predicted with bounded concurrency (vision.predict_labels, so through the prediction cache and
+### the resilience layer), resolved to DIM_PRODUCT and matched to their latest purchase with the
+### same ItemIndex as img_concept.py. Results are written in bulk with write_pandas; every written
+### chunk is appended to a checkpoint file so an interrupted run resumes where it stopped.
+###
+### Usage (from the repository root):
+###   python streamlit/batch_recognize.py receipts/ --api-key $LANDINGAI_API_KEY
+###   python streamlit/batch_recognize.py @IMG_RECG.INSTAGE/RECEIPTS --predict-concurrency 16
+
+import argparse, io, json, os, sys, time, uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+import yaml
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import vision
+from api_clients import configure_http_pool
+from image_prep import preprocess_image
+from item_index import ItemIndex
+from prediction_cache import PredictionCache
+from product_resolver import ProductResolver
+from reference_data import ReferenceData
+from resilience import configure_resilience
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_config(path="streamlit/config.yaml"):
+    with open(path, "r") as file:
+        return yaml.safe_load(file)
+
+
+def list_images(session, source):
+    """(name, reference) of every image under `source`: a local directory or an @stage path."""
+    if source.startswith("@"):
+        stage = source.split("/")[0]
+        rows = session.sql(f"list {source}").collect()
+        names = [row[0].split("/", 1)[1] for row in rows]
+        return [(name, f"{stage}/{name}") for name in sorted(names) if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+    images = []
+    for root, _, files in os.walk(source):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                images.append((os.path.relpath(path, source), path))
+    return sorted(images)
+
+
+def prepare(job):
+    """Process-pool worker: read and preprocess one image; returns (name, JPEG bytes, stats) or (name, None, error)."""
+    name, source, image_settings = job
+    try:
+        prepared = preprocess_image(source, **image_settings)
+        return name, prepared["data"], prepared["stats"]
+    except Exception as e:
+        return name, None, str(e)
+
+
+class Checkpoint:
+    """Append-only record of the images already written, one JSON line per chunk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                for line in file:
+                    if line.strip():
+                        self.done.update(json.loads(line)["images"])
+
+    def record(self, images):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as file:
+            file.write(json.dumps({"at": time.time(), "images": images}) + "\n")
+        self.done.update(images)
+
+
+class Matcher:
+    """Label -> product and latest purchase, over the current reference data."""
+
+    def __init__(self, reference_data, synonyms, min_confidence):
+        self.resolver = ProductResolver(reference_data.get("IMG_RECG.DIM_PRODUCT"), synonyms)
+        self.item_index = ItemIndex(reference_data.get("IMG_RECG.TRANSACTION"))
+        self.min_confidence = min_confidence
+
+    def match(self, label):
+        product_id, product_name, confidence = self.resolver.resolve(label)
+        if product_id is None or confidence < self.min_confidence:
+            product_id, product_name = None, None
+        _, latest = self.item_index.lookup(product_name or label)
+        return {"LABEL": label
+                , "PRODUCT_ID": product_id
+                , "PRODUCT_NAME": product_name
+                , "MATCH_CONFIDENCE": confidence
+                , "LAST_PURCHASE_TS": None if latest is None else str(latest["TRANSACTION_TIMESTAMP"])
+                , "LAST_MERCHANT": None if latest is None else latest["MERCHANT_NAME"]
+                , "LAST_AMOUNT": None if latest is None else float(latest["AMOUNT"])}
+
+
+class BatchRun:
+    def __init__(self, session, config, args):
+        self.session = session
+        self.config = config
+        self.args = args
+        self.batch_id = uuid.uuid4().hex
+        self.prediction_cache = PredictionCache(**config["prediction_cache"])
+        reference_data = ReferenceData(lambda: session, **config["reference_data"])
+        self.matcher = Matcher(reference_data
+                               , config["product_resolver"]["synonyms"]
+                               , config["product_resolver"]["min_confidence"])
+        self.stats = {"images": 0, "skipped": 0, "failed": 0, "detections": 0, "rows_written": 0, "predict_seconds": []}
+
+    def read_source(self, reference):
+        """Bytes of a stage image, or the local path (read by the worker process)."""
+        if reference.startswith("@"):
+            return self.session.file.get_stream(reference, decompress=False).read()
+        return reference
+
+    def predict(self, name, data, stats):
+        """Thread-pool task: labels of one preprocessed image, matched to products and purchases."""
+        if data is None:
+            return [self.row(name, status="FAILURE", error=stats)]
+        prepared = {"image": Image.open(io.BytesIO(data)), "data": data, "stats": dict(stats)}
+        try:
+            labels = vision.predict_labels(prepared, self.args.endpoint_id, self.args.api_key, self.prediction_cache)
+        except Exception as e:
+            return [self.row(name, status="FAILURE", error=str(e))]
+        if "predict_seconds" in prepared["stats"]:
+            self.stats["predict_seconds"].append(prepared["stats"]["predict_seconds"])
+        if not labels:
+            return [self.row(name, status="NO_DETECTION")]
+        return [self.row(name, **self.matcher.match(label)) for label in dict.fromkeys(labels)]
+
+    def row(self, name, status="SUCCESS", error=None, **match):
+        return dict({"BATCH_ID": self.batch_id, "IMAGE_NAME": name, "STATUS": status, "ERROR": error
+                     , "LABEL": None, "PRODUCT_ID": None, "PRODUCT_NAME": None, "MATCH_CONFIDENCE": None
+                     , "LAST_PURCHASE_TS": None, "LAST_MERCHANT": None, "LAST_AMOUNT": None}, **match)
+
+    def write(self, rows):
+        if self.args.dry_run or not rows:
+            return
+        snowflake = self.config["snowflake"]
+        self.session.write_pandas(pd.DataFrame(rows), self.config["batch"]["table"]
+                                  , database=snowflake["database"], schema=snowflake["schema"])
+        self.stats["rows_written"] += len(rows)
+
+    def report(self, started, final=False):
+        elapsed = time.perf_counter() - started
+        done = self.stats["images"]
+        line = (f"{done} images, {self.stats['detections']} detections, {self.stats['failed']} failed"
+                f", {done / elapsed if elapsed else 0:.2f} images/sec")
+        print(("done: " if final else "") + line, file=sys.stderr, flush=True)
+
+    def run(self, images, checkpoint):
+        todo = [(name, reference) for name, reference in images if name not in checkpoint.done]
+        self.stats["skipped"] = len(images) - len(todo)
+        chunk = self.config["batch"]["chunk_images"]
+        image_settings = self.config["image"]
+        started = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.args.process_workers) as processes, \
+             ThreadPoolExecutor(max_workers=self.args.predict_concurrency) as predictors:
+            for start in range(0, len(todo), chunk):
+                part = todo[start:start + chunk]
+                jobs = [(name, source, image_settings) for (name, _), source
+                        in zip(part, predictors.map(self.read_source, [reference for _, reference in part]))]
+                futures = [predictors.submit(self.predict, *prepared) for prepared in processes.map(prepare, jobs)]
+
+                rows, written = [], []
+                for (name, _), future in zip(part, futures):
+                    image_rows = future.result()
+                    rows += image_rows
+                    self.stats["images"] += 1
+                    if image_rows[0]["STATUS"] == "FAILURE":
+                        self.stats["failed"] += 1
+                    else:
+                        # Failed images are not checkpointed, so the next run retries them.
+                        written.append(name)
+                        self.stats["detections"] += sum(1 for row in image_rows if row["STATUS"] == "SUCCESS")
+
+                self.write(rows)
+                if not self.args.dry_run:
+                    # A dry run writes nothing, so it must not mark the images done for the next real run.
+                    checkpoint.record(written)
+                self.report(started)
+
+        self.report(started, final=True)
+        return time.perf_counter() - started
+
+
+def main():
+    config = load_config()
+    batch = config["batch"]
+    parser = argparse.ArgumentParser(description="Bulk image recognition and transaction matching.")
+    parser.add_argument("source", help="Local directory or stage path (e.g. @IMG_RECG.INSTAGE/RECEIPTS).")
+    parser.add_argument("--api-key", default=os.environ.get("LANDINGAI_API_KEY", ""))
+    parser.add_argument("--endpoint-id", default=config["endpoint"]["landingai"])
+    parser.add_argument("--process-workers", type=int, default=batch["process_workers"])
+    parser.add_argument("--predict-concurrency", type=int, default=batch["predict_concurrency"])
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: one per source under batch.checkpoint_dir).")
+    parser.add_argument("--dry-run", action="store_true", help="Predict and match, but do not write to Snowflake.")
+    args = parser.parse_args()
+
+    import streamlit as st
+    from snowflake.snowpark import Session
+    session = Session.builder.configs(st.secrets["connections"]["snowflake"]).getOrCreate()
+    args.api_key = args.api_key or st.secrets["LandingAI_key"]
+
+    configure_http_pool(**config["http"])
+    configure_resilience(**config["resilience"])
+
+    checkpoint_name = "".join(ch if ch.isalnum() else "_" for ch in args.source.strip("/@")) + ".jsonl"
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(batch["checkpoint_dir"], checkpoint_name))
+    run = BatchRun(session, config, args)
+    images = list_images(session, args.source)
+    elapsed = run.run(images, checkpoint)
+
+    predict_seconds = sorted(run.stats.pop("predict_seconds"))
+    summary = dict(run.stats
+                   , batch_id=run.batch_id
+                   , elapsed_seconds=round(elapsed, 3)
+                   , images_per_second=round(run.stats["images"] / elapsed, 3) if elapsed else None
+                   , predict_p50_seconds=predict_seconds[len(predict_seconds) // 2] if predict_seconds else None)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
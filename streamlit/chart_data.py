@@ -0,0 +1,119 @@
+### Chart data engine for generated-SQL results.
+### Bar charts aggregate y per x in Snowflake by wrapping the generated SQL, so only one row per bar
+### comes back however large the result is; line charts are downsampled with Largest-Triangle-
+### Three-Buckets (LTTB), which keeps the visual shape with a fixed number of points.
+### Prepared series are cached per (request_id, x, y, chart type) and shared by every session.
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from result_cache import as_subquery
+
+AGGREGATES = {"sum": "sum", "avg": "mean", "min": "min", "max": "max", "count": "count"}
+
+
+def quote_ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def bar_query(sql, x_col, y_col, aggregate="sum", max_bars=500):
+    """Generated SQL wrapped in a GROUP BY x that aggregates y, one row per bar."""
+    value = "count(*)" if aggregate == "count" else f"{aggregate}({quote_ident(y_col)})"
+    return (f"select {quote_ident(x_col)} as X, {value} as Y\n"
+            f"from (\n{as_subquery(sql)})\n"
+            f"group by 1\norder by 1\nlimit {int(max_bars)}")
+
+
+def bar_series(frame):
+    """Series of a bar_query result (columns X, Y)."""
+    return frame.set_index(frame.columns[0])[frame.columns[1]]
+
+
+def local_bar_series(df, x_col, y_col, aggregate="sum", max_bars=500):
+    """Same aggregation as bar_query, over rows already loaded in pandas."""
+    values = df[y_col] if aggregate == "count" else pd.to_numeric(df[y_col], errors="coerce")
+    return values.groupby(df[x_col]).agg(AGGREGATES[aggregate]).sort_index().head(max_bars)
+
+
+def lttb(x, y, threshold):
+    """Indexes of the `threshold` points LTTB keeps from the series (x, y); x must be sorted."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    picked = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        picked.append(a)
+    picked.append(n - 1)
+    return np.array(picked)
+
+
+def line_series(df, x_col, y_col, max_points=2000):
+    """
+    (y by x for a line chart, downsampled): sorted by x and reduced with LTTB to at most
+    `max_points`; the flag tells whether LTTB ran.
+    """
+    frame = pd.DataFrame({"x": df[x_col], "y": pd.to_numeric(df[y_col], errors="coerce")}).dropna()
+    try:
+        frame = frame.sort_values("x", kind="stable")
+    except TypeError:
+        pass
+
+    downsampled = len(frame) > max_points
+    if downsampled:
+        x = frame["x"]
+        if pd.api.types.is_datetime64_any_dtype(x):
+            x_values = x.astype("int64").to_numpy(dtype=float)
+        elif pd.api.types.is_numeric_dtype(x):
+            x_values = x.to_numpy(dtype=float)
+        else:
+            x_values = np.arange(len(frame), dtype=float)
+        frame = frame.iloc[lttb(x_values, frame["y"].to_numpy(dtype=float), max_points)]
+
+    return frame.set_index("x")["y"].rename_axis(x_col).rename(y_col), downsampled
+
+
+class ChartCache:
+    """LRU of prepared chart series."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.entries[key]
+
+        series = build()
+        with self._lock:
+            self.entries[key] = series
+            self.entries.move_to_end(key)
+            self.stats["misses"] += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return series
+
+
+@st.cache_resource(show_spinner=False)
+def get_chart_cache(max_entries=256, **_):
+    """One ChartCache per process, shared by every session."""
+    return ChartCache(max_entries=max_entries)
@@ -0,0 +1,117 @@
+### Shared Snowflake data access for both apps.
+### A process-wide pool of Snowpark sessions created lazily on first use (so the page paints before
+### Snowflake is reached), health-checked at most every `health_check_seconds` and transparently
+### re-created when a session has expired. Queries round-robin over the pool so concurrent Streamlit
+### sessions do not serialize on one connection; REST calls take host and token from one place and
+### reconnect once on 401.
+
+import itertools, threading, time
+import streamlit as st
+from snowflake.snowpark import Session
+from api_clients import post_json
+
+## Defaults, overridable through configure_data_access() with the `data_access` section of config.yaml.
+DATA_ACCESS_SETTINGS = {"pool_size": 2, "health_check_seconds": 60}
+
+
+def configure_data_access(pool_size=2, health_check_seconds=60, **_):
+    """Set the pool size and health-check interval used when the pool is created."""
+    DATA_ACCESS_SETTINGS.update(pool_size=pool_size, health_check_seconds=health_check_seconds)
+
+
+class SessionPool:
+    """Lazily created, health-checked Snowpark sessions; slot 0 also serves the REST credentials."""
+
+    def __init__(self, connection_params, pool_size=2, health_check_seconds=60):
+        self.connection_params = connection_params
+        self.pool_size = max(1, pool_size)
+        self.health_check_seconds = health_check_seconds
+        self.sessions = [None] * self.pool_size
+        self.checked_at = [0.0] * self.pool_size
+        self.stats = {"connects": 0, "reconnects": 0, "health_checks": 0, "failed_checks": 0}
+        self._next = itertools.count()
+        self._locks = [threading.Lock() for _ in range(self.pool_size)]
+
+    def _connect(self, slot):
+        session = Session.builder.configs(self.connection_params).create()
+        self.sessions[slot] = session
+        self.checked_at[slot] = time.monotonic()
+        self.stats["connects"] += 1
+        return session
+
+    def _alive(self, session):
+        is_closed = getattr(session.connection, "is_closed", None)
+        if is_closed is not None and is_closed():
+            return False
+        self.stats["health_checks"] += 1
+        try:
+            session.sql("select 1").collect()
+            return True
+        except Exception:
+            self.stats["failed_checks"] += 1
+            return False
+
+    def _close(self, session):
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def get(self, slot=None):
+        """A healthy session: slot `slot`, or the next one round-robin."""
+        slot = next(self._next) % self.pool_size if slot is None else slot
+        with self._locks[slot]:
+            session = self.sessions[slot]
+            if session is None:
+                return self._connect(slot)
+            if time.monotonic() - self.checked_at[slot] >= self.health_check_seconds:
+                self.checked_at[slot] = time.monotonic()
+                if not self._alive(session):
+                    self._close(session)
+                    self.stats["reconnects"] += 1
+                    return self._connect(slot)
+            return session
+
+    def reconnect(self, slot=0):
+        """Replace the session in `slot`, e.g. after its token was rejected."""
+        with self._locks[slot]:
+            if self.sessions[slot] is not None:
+                self._close(self.sessions[slot])
+                self.stats["reconnects"] += 1
+            return self._connect(slot)
+
+    def rest_credentials(self):
+        """(host, token) for the Cortex REST endpoints, from the primary session."""
+        connection = self.get(0).connection
+        return connection.host, connection.rest.token
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_pool():
+    """One SessionPool per process, shared by every user session."""
+    return SessionPool(dict(st.secrets["connections"]["snowflake"])
+                       , pool_size=DATA_ACCESS_SETTINGS["pool_size"]
+                       , health_check_seconds=DATA_ACCESS_SETTINGS["health_check_seconds"])
+
+
+def get_session():
+    """A healthy Snowpark session from the shared pool."""
+    return get_session_pool().get()
+
+
+def get_primary_session():
+    """The pool's first session, for work that must stay on one connection (e.g. Root / stage access)."""
+    return get_session_pool().get(0)
+
+
+def post_rest(path, body, stream=False):
+    """POST to a Snowflake REST endpoint with the current token; reconnects and retries once on 401."""
+    pool = get_session_pool()
+    host, token = pool.rest_credentials()
+    resp = post_json(host, path, body, token, stream=stream)
+    if resp.status_code == 401:
+        resp.close()
+        pool.reconnect(0)
+        host, token = pool.rest_credentials()
+        resp = post_json(host, path, body, token, stream=stream)
+    return resp
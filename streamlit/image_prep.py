@@ -0,0 +1,65 @@
+### Client-side image preprocessing before the LandingAI upload.
+### Phone photos are oriented, downscaled to a max edge, converted to RGB and recompressed,
+### which shrinks the upload by an order of magnitude without hurting object detection.
+
+import io, time
+from PIL import Image, ImageOps
+
+DEFAULT_MAX_EDGE = 1024
+DEFAULT_JPEG_QUALITY = 85
+
+
+def read_image_bytes(image_file):
+    """Read raw bytes from an UploadedFile, a file path or an already loaded bytes object."""
+    if isinstance(image_file, (bytes, bytearray)):
+        return bytes(image_file)
+    if hasattr(image_file, "getvalue"):
+        return image_file.getvalue()
+    if hasattr(image_file, "read"):
+        image_file.seek(0)
+        return image_file.read()
+    with open(image_file, "rb") as file:
+        return file.read()
+
+
+def preprocess_image(image_file, max_edge=DEFAULT_MAX_EDGE, jpeg_quality=DEFAULT_JPEG_QUALITY):
+    """
+    Prepare an uploaded image for prediction.
+    Returns a dict with the PIL image, its JPEG bytes (what is uploaded) and before/after size and timing stats.
+    """
+    start = time.perf_counter()
+    raw = read_image_bytes(image_file)
+
+    image = Image.open(io.BytesIO(raw))
+    original_size = image.size
+    image = ImageOps.exif_transpose(image)
+
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=jpeg_quality, optimize=True)
+    data = buffer.getvalue()
+
+    return {
+        "image": image,
+        "data": data,
+        "stats": {
+            "original_bytes": len(raw),
+            "processed_bytes": len(data),
+            "original_size": original_size,
+            "processed_size": image.size,
+            "seconds": round(time.perf_counter() - start, 4),
+        },
+    }
+
+
+def make_thumbnail(image_file, max_edge=400, jpeg_quality=70):
+    """Small oriented JPEG of an upload, for display in the chat history."""
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(read_image_bytes(image_file))))
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=jpeg_quality, optimize=True)
+    return buffer.getvalue()
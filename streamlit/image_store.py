@@ -0,0 +1,113 @@
+### Per-session store of uploaded images.
+### The chat history keeps only a key per image: a small thumbnail stays in memory for display and
+### the original is spilled to a session directory on local disk, where predictions read it and
+### evicted thumbnails are rebuilt from. Both tiers have a byte budget and evict oldest-first, so a
+### session's footprint stays flat however many photos it uploads.
+
+import hashlib, os, shutil, time, uuid
+from collections import OrderedDict
+from image_prep import make_thumbnail, read_image_bytes
+
+
+def sweep_stale_sessions(root, max_age_seconds):
+    """Remove session directories under `root` untouched for longer than `max_age_seconds`."""
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+class ImageStore:
+    """Thumbnails in memory and originals on disk for one session, keyed by content hash."""
+
+    def __init__(self, disk_dir, thumbnail_max_edge=400, max_memory_bytes=2 * 1024 * 1024, max_disk_bytes=50 * 1024 * 1024, max_age_seconds=86400):
+        self.disk_dir = os.path.join(disk_dir, uuid.uuid4().hex) if disk_dir else ""
+        self.thumbnail_max_edge = thumbnail_max_edge
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self.thumbnails = OrderedDict()   # key -> thumbnail JPEG bytes
+        self.originals = OrderedDict()    # key -> bytes on disk
+        self.stats = {"added": 0, "evicted_thumbnails": 0, "evicted_originals": 0, "spill_failures": 0, "rebuilt_thumbnails": 0}
+        if disk_dir:
+            sweep_stale_sessions(disk_dir, max_age_seconds)
+
+    def add(self, image_file):
+        """Keep a thumbnail of the upload, spill its original to disk and return the image key."""
+        raw = read_image_bytes(image_file)
+        key = hashlib.sha256(raw).hexdigest()[:16]
+        self.stats["added"] += 1
+
+        if key not in self.thumbnails:
+            self.thumbnails[key] = make_thumbnail(raw, max_edge=self.thumbnail_max_edge)
+        self.thumbnails.move_to_end(key)
+
+        if self.disk_dir and key not in self.originals:
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                with open(self._path(key), "wb") as file:
+                    file.write(raw)
+                self.originals[key] = len(raw)
+            except OSError:
+                self.stats["spill_failures"] += 1
+
+        self._evict()
+        return key
+
+    def thumbnail(self, key):
+        """Thumbnail bytes of `key`, rebuilt from the spilled original when evicted; None once both are gone."""
+        if key not in self.thumbnails and key in self.originals:
+            try:
+                with open(self._path(key), "rb") as file:
+                    self.thumbnails[key] = make_thumbnail(file.read(), max_edge=self.thumbnail_max_edge)
+                self.stats["rebuilt_thumbnails"] += 1
+                self._evict()
+            except OSError:
+                return None
+        return self.thumbnails.get(key)
+
+    def source(self, key, image_file):
+        """What to read the original of `key` from: its spilled file when on disk, else the upload itself."""
+        return self.original_path(key) or image_file
+
+    def original_path(self, key):
+        """Path of the spilled original of `key`, or None when it is not on disk."""
+        return self._path(key) if key in self.originals else None
+
+    def memory_bytes(self):
+        return sum(len(data) for data in self.thumbnails.values())
+
+    def disk_bytes(self):
+        return sum(self.originals.values())
+
+    def clear(self):
+        self.thumbnails.clear()
+        self.originals.clear()
+        if self.disk_dir:
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.img")
+
+    def _evict(self):
+        memory = self.memory_bytes()
+        while len(self.thumbnails) > 1 and memory > self.max_memory_bytes:
+            _, data = self.thumbnails.popitem(last=False)
+            memory -= len(data)
+            self.stats["evicted_thumbnails"] += 1
+
+        disk = self.disk_bytes()
+        while len(self.originals) > 1 and disk > self.max_disk_bytes:
+            key, size = self.originals.popitem(last=False)
+            disk -= size
+            self.stats["evicted_originals"] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
@@ -1,10 +1,24 @@
 import streamlit as st
 import pandas as pd
-import re
-from snowflake.snowpark import Session
+import re, yaml
 from snowflake.core import Root
-from PIL import Image
-from landingai.predict import Predictor
+from api_clients import LANDINGAI_TRANSIENT_ERRORS, configure_http_pool, get_predictor
+from data_access import configure_data_access, get_primary_session, get_session
+from asset_cache import get_asset_cache, get_banner_image
+from resilience import call_idempotent, configure_resilience
+from image_prep import preprocess_image
+from item_index import get_item_index
+from item_history import items_history_query
+from result_cache import get_result_cache
+from reference_data import get_reference_data
+
+### Open config.yaml file.
+with open("streamlit/config.yaml", "r") as file:
+    config = yaml.safe_load(file)
+
+configure_http_pool(**config["http"])
+configure_resilience(**config["resilience"])
+configure_data_access(**config["data_access"])
 
 # service parameters
 CORTEX_SEARCH_DATABASE = "RESUME_AI_DB"
@@ -17,30 +31,31 @@ AVAILABLE_SEMANTIC_MODELS_PATHS = [
 ]
 API_ENDPOINT = "/api/v2/cortex/analyst/message"
 FEEDBACK_API_ENDPOINT = "/api/v2/cortex/analyst/feedback"
-API_TIMEOUT = 50000  # in milliseconds
 
-### Connection to Snowflake and get Cortex Search Service from Root(session).
-session = Session.builder.configs(st.secrets["connections"]["snowflake"]).getOrCreate()
+### Connection to Snowflake: the shared session pool connects on first use, not at import.
 
 ## Chatbot related objects
-root = Root(session)
-svc = root.databases[CORTEX_SEARCH_DATABASE].schemas[CORTEX_SEARCH_SCHEMA].cortex_search_services[CORTEX_SEARCH_SERVICE]
+@st.cache_resource(show_spinner=False)
+def get_search_service():
+  """Cortex Search Service from Root(session), resolved once per process."""
+  root = Root(get_primary_session())
+  return root.databases[CORTEX_SEARCH_DATABASE].schemas[CORTEX_SEARCH_SCHEMA].cortex_search_services[CORTEX_SEARCH_SERVICE]
 
 ## API Info
-api_info = session.table("IMG_RECG.API_CREDENTIALS").to_pandas()
-landingai_api = api_info[api_info["NAME"]=="LANDINGAI"]
-api_key_euph = landingai_api["API_KEY"].values[0]
-endpoint_id = landingai_api["ENDPOINT_ID"].values[0]
+@st.cache_resource(show_spinner=False)
+def get_landingai_endpoint():
+  """LandingAI endpoint id from IMG_RECG.API_CREDENTIALS, read once per process."""
+  api_info = get_session().table("IMG_RECG.API_CREDENTIALS").to_pandas()
+  landingai_api = api_info[api_info["NAME"]=="LANDINGAI"]
+  return landingai_api["ENDPOINT_ID"].values[0]
+
 api_key = None
 
+## Reference data, loaded once per process and shared by every session
+reference_data = get_reference_data(get_session, **config["reference_data"])
+
 ## Website contents
 images_path = "@IMG_RECG.INSTAGE"
-website_imgs = session.table("IMG_RECG.WEBSITE_IMAGES").to_pandas()
-banner_loc = website_imgs[website_imgs["DESCRIPTION"]=="BANNER"]["IMAGE_NAME"].values[0]
-banner_image = session.file.get_stream(f"{images_path}/BANNER/{banner_loc}" , decompress=False).read()
-
-## Transaction Info
-tran_info = session.table("IMG_RECG.TRANSACTION").to_pandas()
 
 if __name__ == "__main__":
   ### Set page layout
@@ -61,24 +76,32 @@ if __name__ == "__main__":
       # To read file as bytes:
       bytes_data = uploaded_file.getvalue()
 
-      # Upload the image:
-      imagefile = Image.open(uploaded_file)
+      # Orient, downscale and recompress the image before the upload:
+      prepared = preprocess_image(uploaded_file, **config["image"])
 
       if api_key:
         try:
           # Send to model for prediction,
-          predictor = Predictor(endpoint_id, api_key=api_key)
-          predictions = predictor.predict(imagefile) #ObjectDetectionPrediction Object
+          predictor = get_predictor(get_landingai_endpoint(), api_key)
+          predictions = call_idempotent("landingai", lambda: predictor.predict_bytes(prepared["data"]), hedge=True
+                                        , transient=LANDINGAI_TRANSIENT_ERRORS) #ObjectDetectionPrediction Object
         except Exception as e:
-          err_message = e.message
+          err_message = getattr(e, "message", str(e))
 
       # Predict the result
       with st.expander("📰 Returned result:"):
         st.json(predictions)
+        st.caption(f"Upload size: {prepared['stats']['original_bytes']:,} → {prepared['stats']['processed_bytes']:,} bytes, "
+                   f"preprocessed in {prepared['stats']['seconds']}s")
 
   ### Main Top Area:
-  ### The banner
-  st.image(banner_image, width = 1400)
+  ### The banner; the sidebar is already painted while Snowflake connects.
+  with st.spinner("Connecting to Snowflake..."):
+    st.image(get_banner_image(reference_data, get_asset_cache(get_session, **config["assets"]), images_path), width = 1400)
+
+    ## Transaction Info
+    tran_info = reference_data.get("IMG_RECG.TRANSACTION")
+    item_index = get_item_index(tran_info, reference_data.version("IMG_RECG.TRANSACTION"))
 
   ### The 1st section in MAIN PAGE
   with st.expander("🛍️ Shopping Transactions"):
@@ -119,18 +142,24 @@ if __name__ == "__main__":
           if item_name not in list_predicted_items:
             ## Show each item:
             with st.expander(f"{count} : {item_name}"):
-              df_item = tran_info[tran_info["ITEM"].str.contains(item_name, case = False)]
-              
+              ## One precomputed summary row per item name the ItemIndex matches, in a single
+              ## exact-name query (see item_history.py)
+              matched_items = item_index.match_items(item_name)
+              df_item = pd.DataFrame()
+              if matched_items:
+                result_cache = get_result_cache(**config["result_cache"])
+                watermark = reference_data.watermark("IMG_RECG.TRANSACTION")
+                df_item = result_cache.get(get_session(), items_history_query(matched_items), watermark).frame
+
               if len(df_item):
                 ## Show dataset:
                 st.dataframe(df_item)
 
                 ## Latest purchase
-                latest_purchase = df_item[df_item["TRANSACTION_TIMESTAMP"]==df_item["TRANSACTION_TIMESTAMP"].max()]
-
-                datets = latest_purchase["TRANSACTION_TIMESTAMP"].values[0]
-                store = latest_purchase["MERCHANT_NAME"].values[0]
-                amount = latest_purchase["AMOUNT"].values[0]
+                latest_purchase = df_item.loc[df_item["LAST_PURCHASE"].idxmax()]
+                datets = latest_purchase["LAST_PURCHASE"]
+                store = latest_purchase["LAST_MERCHANT"]
+                amount = latest_purchase["LAST_AMOUNT"]
                 
                 st.markdown(f"The most recent purchase of :blue-background[{item_name}] is at :blue[{store}] at :orange-badge[{datets}] for :red[${amount}].")
                 #st.button("Re-purchase?")
@@ -0,0 +1,52 @@
+### Purchase-history summary of a detected item (last purchase, spend, frequency).
+### Reads the precomputed IMG_RECG.ITEM_PURCHASE_SUMMARY row of the item and folds in only the
+### TRANSACTION rows the refresh task has not merged yet (an _ID range scan), instead of
+### aggregating the whole transaction history. The query only depends on the label, so it can be
+### submitted to the result cache as soon as the image prediction returns.
+
+ITEM_HISTORY_SQL = """with items as (
+    select ITEM, FIRST_PURCHASE, LAST_PURCHASE, LAST_MERCHANT_NAME, LAST_AMOUNT, PURCHASES, TOTAL_SPEND
+    from IMG_RECG.ITEM_PURCHASE_SUMMARY
+    where {condition}
+    union all
+    select ITEM
+         , min(TRANSACTION_TIMESTAMP)
+         , max(TRANSACTION_TIMESTAMP)
+         , max_by(MERCHANT_NAME, TRANSACTION_TIMESTAMP)
+         , max_by(AMOUNT, TRANSACTION_TIMESTAMP)
+         , count(*)
+         , sum(AMOUNT)
+    from IMG_RECG.TRANSACTION
+    where _ID > (select coalesce(max(MAX_SOURCE_ID), 0) from IMG_RECG.ITEM_PURCHASE_SUMMARY)
+      and {condition}
+    group by ITEM
+)
+select ITEM
+     , max(LAST_PURCHASE) as LAST_PURCHASE
+     , min(FIRST_PURCHASE) as FIRST_PURCHASE
+     , sum(PURCHASES) as PURCHASES
+     , sum(TOTAL_SPEND) as TOTAL_SPEND
+     , sum(TOTAL_SPEND) / sum(PURCHASES) as AVG_PRICE
+     , round(datediff(day, min(FIRST_PURCHASE), max(LAST_PURCHASE)) / nullif(sum(PURCHASES) - 1, 0), 1) as DAYS_BETWEEN_PURCHASES
+     , max_by(LAST_MERCHANT_NAME, LAST_PURCHASE) as LAST_MERCHANT
+     , max_by(LAST_AMOUNT, LAST_PURCHASE) as LAST_AMOUNT
+from items
+group by ITEM
+order by LAST_PURCHASE desc"""
+
+
+def sql_literal(text):
+    """Quoted Snowflake string literal of `text`."""
+    return "'" + str(text).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def item_history_query(label, product_id=None):
+    """Purchase-history summary query for one detected label, by PRODUCT_ID when it was resolved."""
+    if product_id is not None:
+        return ITEM_HISTORY_SQL.format(condition=f"PRODUCT_ID = {int(product_id)}")
+    return ITEM_HISTORY_SQL.format(condition=f"contains(lower(ITEM), lower({sql_literal(label)}))")
+
+
+def items_history_query(items):
+    """Purchase-history summary query for exact item names (e.g. ItemIndex.match_items), one row each."""
+    return ITEM_HISTORY_SQL.format(condition=f"ITEM in ({', '.join(sql_literal(item) for item in items)})")
@@ -0,0 +1,95 @@
+### Precomputed product matcher over the TRANSACTION table.
+### Built once per data refresh: normalized item-name tokens map to item names, item names map to
+### row positions, and the latest purchase of every item is computed with one vectorized groupby.
+### A detected label then resolves with a couple of dict lookups instead of a regex scan of every row.
+
+import re
+import streamlit as st
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_token(token):
+    """
+    Lower-case stem shared by the singular and plural of a word: candy / candies -> candi,
+    cookie / cookies -> cooki, box / boxes -> box, cracker / crackers -> cracker.
+    """
+    token = token.lower()
+    # -y, -ie and -ies all meet at -i, so berry / berries and cookie / cookies match.
+    if len(token) > 3 and token.endswith("ies"):
+        return token[:-2]
+    if len(token) > 2 and token.endswith("ie"):
+        return token[:-1]
+    if len(token) > 2 and token.endswith("y") and token[-2] not in "aeiouy":
+        return token[:-1] + "i"
+    if len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [normalize_token(each) for each in _WORD.findall(str(text).lower())]
+
+
+class ItemIndex:
+    """Constant-time lookup of the transactions and latest purchase of a detected label."""
+
+    def __init__(self, frame, item_col="ITEM", time_col="TRANSACTION_TIMESTAMP"):
+        self.frame = frame.reset_index(drop=True)
+        self.item_col = item_col
+        self.time_col = time_col
+
+        # item name -> row positions, and token -> item names
+        self.item_rows = self.frame.groupby(item_col, sort=False).indices
+        self.token_items = {}
+        for item in self.item_rows:
+            for token in tokenize(item):
+                self.token_items.setdefault(token, set()).add(item)
+
+        # item name -> its most recent purchase (timestamp, merchant, amount, ...)
+        if len(self.frame):
+            latest_pos = self.frame.groupby(item_col, sort=False)[time_col].idxmax()
+            self.latest = self.frame.loc[latest_pos.values].set_index(item_col, drop=False)
+        else:
+            self.latest = self.frame.set_index(item_col, drop=False)
+
+        self._memo = {}
+
+    def match_items(self, label):
+        """Item names containing every (normalized) token of the label."""
+        tokens = tokenize(label)
+        if not tokens:
+            return []
+        items = None
+        for token in tokens:
+            found = self.token_items.get(token, set())
+            items = found if items is None else items & found
+            if not items:
+                return []
+        return sorted(items)
+
+    def lookup(self, label):
+        """
+        Return (matching transactions, latest purchase row) for a detected label.
+        The latest purchase row is None when nothing matches.
+        """
+        key = label.lower()
+        if key not in self._memo:
+            items = self.match_items(label)
+            if not items:
+                self._memo[key] = (self.frame.iloc[0:0], None)
+            else:
+                positions = [pos for item in items for pos in self.item_rows[item]]
+                rows = self.frame.iloc[sorted(positions)]
+                latest = self.latest.loc[items]
+                latest_purchase = latest.loc[latest[self.time_col].idxmax()]
+                self._memo[key] = (rows, latest_purchase)
+        return self._memo[key]
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def get_item_index(_frame, version):
+    """Item index of the current TRANSACTION snapshot; rebuilt when the reference data version changes."""
+    return ItemIndex(_frame)
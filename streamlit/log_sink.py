@@ -0,0 +1,131 @@
+### Background log sink for IMG_RECG.CHAT_MESSAGE / IMG_RECG.FEEDBACK / IMG_RECG.PERF_SPAN
+### (and IMG_RECG.ANSWER_CACHE when answers are persisted).
+### Rows are queued in-process and written by a background thread as multi-row,
+### bind-parameterized inserts, so logging never sits on the user's critical path.
+
+import atexit, json, queue, threading, time
+
+## Column layout of every table the sink writes to.
+## Columns listed in the second element are VARIANT and go through PARSE_JSON.
+LOG_TABLES = {
+    "IMG_RECG.CHAT_MESSAGE": (["REQUEST_ID", "ROLE", "MESSAGE", "SUGGESTION", "SQL", "CONFIDENCE", "SOURCE_REQUEST_ID"], {"SUGGESTION"}),
+    "IMG_RECG.FEEDBACK": (["REQUEST_ID", "RATING", "FEEDBACK_MESSAGE"], set()),
+    "IMG_RECG.PERF_SPAN": (["REQUEST_ID", "SPAN_NAME", "STARTED_AT", "DURATION_MS"], set()),
+    "IMG_RECG.ANSWER_CACHE": (["ANSWER_KEY", "REQUEST_ID", "RESPONSE"], {"RESPONSE"}),
+}
+
+
+def build_insert(table, rows):
+    """Build one multi-row INSERT ... SELECT ... FROM VALUES statement and its bind parameters."""
+    columns, variant_columns = LOG_TABLES[table]
+
+    select_list = []
+    for pos, column in enumerate(columns, start=1):
+        if column in variant_columns:
+            select_list.append(f"PARSE_JSON(column{pos})")
+        else:
+            select_list.append(f"column{pos}")
+
+    row_binds = "(" + ", ".join(["?"] * len(columns)) + ")"
+    query = (f"insert into {table}({', '.join(columns)}) "
+             f"select {', '.join(select_list)} from values {', '.join([row_binds] * len(rows))}")
+
+    params = []
+    for row in rows:
+        for column in columns:
+            value = row.get(column)
+            if column in variant_columns:
+                value = None if value is None else json.dumps(value)
+            elif isinstance(value, (dict, list)):
+                value = json.dumps(value)
+            elif value is not None and not isinstance(value, (str, int, float)):
+                value = str(value)
+            params.append(value)
+
+    return query, params
+
+
+class LogSink:
+    """Bounded queue of log rows flushed to Snowflake by size or time on a daemon thread."""
+
+    def __init__(self, session_provider, max_queue=10000, batch_size=200, flush_interval_seconds=2.0):
+        self.session_provider = session_provider
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_seconds
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "statements": 0, "failures": 0}
+        self._lock = threading.Lock()     # stats are updated from callers and the flush thread
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, table, row):
+        """Queue one row; never blocks. Rows are dropped (and counted) when the queue is full."""
+        try:
+            self.queue.put_nowait((table, row))
+            self._count(queued=1)
+        except queue.Full:
+            self._count(dropped=1)
+
+    def _count(self, **deltas):
+        with self._lock:
+            for stat, delta in deltas.items():
+                self.stats[stat] += delta
+
+    def _take_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _flush(self, batch):
+        by_table = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+
+        for table, rows in by_table.items():
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start + self.batch_size]
+                query, params = build_insert(table, chunk)
+                try:
+                    self.session_provider().sql(query, params=params).collect()
+                    self._count(written=len(chunk), statements=1)
+                except Exception as e:
+                    self._count(failures=1, dropped=len(chunk))
+                    with self._lock:
+                        self.stats["last_error"] = str(e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+    def close(self):
+        """Stop the background thread, wait for its last flush, then write whatever is still queued."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        # No timeout: draining while the worker is still flushing would race it for the queue, and
+        # whatever it holds would be lost when the process exits.
+        self._thread.join()
+        batch = self._drain()
+        if batch:
+            self._flush(batch)
@@ -0,0 +1,74 @@
+### Compact chat history.
+### Each message is a slotted ChatRecord holding its plain text, references to its images and, for
+### the assistant, the parsed response, so request payloads are built from the text alone without
+### copying the history. build_context packs the most recent turns that fit a token budget.
+
+## Rough characters per token of English text, and per-message overhead of the chat format.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+class ChatRecord:
+    """One message of the conversation."""
+
+    __slots__ = ("role", "text", "images", "response", "request_id", "source_request_id", "artifacts", "tokens")
+
+    def __init__(self, role, text="", images=(), response=None, request_id="", source_request_id=""):
+        self.role = role
+        self.text = text
+        self.images = tuple(images)    # uploaded image references, never copied
+        self.response = response       # parsed assistant response items (text / sql / suggestion)
+        self.request_id = request_id
+        self.source_request_id = source_request_id    # turn whose cached answer this one reuses
+        self.artifacts = None          # render artifacts, filled in by the app on first display
+        self.tokens = estimate_tokens(text)
+
+    @classmethod
+    def user(cls, text, images=()):
+        return cls("user", text, images)
+
+    @classmethod
+    def assistant(cls, response, request_id="", source_request_id=""):
+        text = " ".join(item["text"] for item in response if item["type"] == "text" and item.get("text"))
+        return cls("assistant", text, response=response, request_id=request_id, source_request_id=source_request_id)
+
+    @property
+    def content(self):
+        """Display items of the message, in the shape display_message expects."""
+        if self.response is not None:
+            return self.response
+        return [{"type": "text", "text": self.text}] + [{"type": "image", "image": image} for image in self.images]
+
+    def api_message(self):
+        return {"role": self.role, "content": [{"type": "text", "text": self.text}]}
+
+
+def build_context(records, max_tokens=2000, max_messages=20):
+    """
+    Request messages for the latest turn: the last record (the new question) always, then as many
+    earlier complete turns as fit in `max_tokens` / `max_messages`, oldest first.
+    Turns whose answer has no text (e.g. an API error) are left out.
+    """
+    if not records:
+        return []
+
+    picked = [records[-1]]
+    used = records[-1].tokens
+    position = len(records) - 2
+    while position >= 1:
+        answer, question = records[position], records[position - 1]
+        position -= 2
+        if answer.role != "assistant" or question.role != "user":
+            break
+        if not answer.text:
+            continue
+        if used + answer.tokens + question.tokens > max_tokens or len(picked) + 2 > max_messages:
+            break
+        picked += [answer, question]
+        used += answer.tokens + question.tokens
+
+    return [record.api_message() for record in reversed(picked)]
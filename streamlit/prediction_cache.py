@@ -0,0 +1,185 @@
+### Content-addressed cache of LandingAI predictions.
+### Entries are keyed by the sha256 of the preprocessed JPEG plus a 64-bit difference hash (dHash),
+### so exact re-uploads and near-duplicate photos of the same item skip the paid network call.
+### An in-memory LRU tier sits in front of an optional on-disk tier with TTL and size-based eviction.
+
+import hashlib, json, os, threading, time
+from collections import OrderedDict
+from PIL import Image
+import streamlit as st
+
+
+def difference_hash(image, hash_size=8):
+    """64-bit dHash: compare each pixel with its right neighbour on a tiny grayscale thumbnail."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class PredictionCache:
+    """Two-tier (memory LRU + disk) cache of predicted label lists."""
+
+    def __init__(self, max_entries=512, ttl_seconds=604800, max_distance=4, disk_dir="", disk_max_bytes=50 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_distance = max_distance
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self.memory = OrderedDict()   # sha -> {"endpoint_id", "phash", "labels", "created"}
+        self.disk_index = None        # sha -> {"endpoint_id", "phash", "created", "bytes"}, loaded lazily
+        self.stats = {"hits": 0, "near_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, endpoint_id, prepared):
+        """Key of a preprocessed image (see image_prep.preprocess_image)."""
+        return {"endpoint_id": endpoint_id
+                , "sha": hashlib.sha256(prepared["data"]).hexdigest()
+                , "phash": difference_hash(prepared["image"])}
+
+    def _expired(self, entry, now):
+        return now - entry["created"] > self.ttl
+
+    def _near(self, entries, fingerprint, now):
+        """Closest non-expired entry of the same endpoint within max_distance bits, if any."""
+        best_sha, best_distance = None, self.max_distance + 1
+        for sha, entry in entries.items():
+            if entry["endpoint_id"] != fingerprint["endpoint_id"] or self._expired(entry, now):
+                continue
+            distance = (entry["phash"] ^ fingerprint["phash"]).bit_count()
+            if distance < best_distance:
+                best_sha, best_distance = sha, distance
+        return best_sha
+
+    def get(self, fingerprint):
+        """Return the cached label list for an image, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(fingerprint["sha"])
+            if entry and entry["endpoint_id"] == fingerprint["endpoint_id"] and not self._expired(entry, now):
+                self.memory.move_to_end(fingerprint["sha"])
+                self.stats["hits"] += 1
+                return entry["labels"]
+
+            sha = self._near(self.memory, fingerprint, now)
+            if sha:
+                self.memory.move_to_end(sha)
+                self.stats["near_hits"] += 1
+                return self.memory[sha]["labels"]
+
+            if self.disk_dir:
+                self._load_disk_index()
+                sha = fingerprint["sha"] if fingerprint["sha"] in self.disk_index else None
+                if sha is None or self.disk_index[sha]["endpoint_id"] != fingerprint["endpoint_id"] or self._expired(self.disk_index[sha], now):
+                    sha = self._near(self.disk_index, fingerprint, now)
+                if sha:
+                    entry = self._read_disk(sha)
+                    if entry:
+                        self._remember(sha, entry)
+                        self.stats["disk_hits"] += 1
+                        return entry["labels"]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, fingerprint, labels):
+        entry = {"endpoint_id": fingerprint["endpoint_id"]
+                 , "phash": fingerprint["phash"]
+                 , "labels": list(labels)
+                 , "created": time.time()}
+        with self._lock:
+            self._remember(fingerprint["sha"], entry)
+            if self.disk_dir:
+                self._write_disk(fingerprint["sha"], entry)
+
+    def _remember(self, sha, entry):
+        self.memory[sha] = entry
+        self.memory.move_to_end(sha)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    ### Disk tier: one small JSON file per image, named after its sha256.
+    def _path(self, sha):
+        return os.path.join(self.disk_dir, f"{sha}.json")
+
+    def _load_disk_index(self):
+        if self.disk_index is not None:
+            return
+        self.disk_index = {}
+        os.makedirs(self.disk_dir, exist_ok=True)
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.disk_dir, name), "r") as file:
+                    entry = json.load(file)
+                self.disk_index[name[:-5]] = {"endpoint_id": entry["endpoint_id"]
+                                              , "phash": entry["phash"]
+                                              , "created": entry["created"]
+                                              , "bytes": os.path.getsize(os.path.join(self.disk_dir, name))}
+            except (OSError, ValueError, KeyError):
+                continue
+
+    def _read_disk(self, sha):
+        try:
+            with open(self._path(sha), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            self.disk_index.pop(sha, None)
+            return None
+
+    def _write_disk(self, sha, entry):
+        self._load_disk_index()
+        payload = json.dumps(entry)
+        try:
+            with open(self._path(sha), "w") as file:
+                file.write(payload)
+        except OSError:
+            return
+        self.disk_index[sha] = {"endpoint_id": entry["endpoint_id"]
+                                , "phash": entry["phash"]
+                                , "created": entry["created"]
+                                , "bytes": len(payload)}
+        self._evict_disk()
+
+    def _evict_disk(self):
+        now = time.time()
+        for sha in [sha for sha, entry in self.disk_index.items() if self._expired(entry, now)]:
+            self._remove_disk(sha)
+
+        total = sum(entry["bytes"] for entry in self.disk_index.values())
+        for sha in sorted(self.disk_index, key=lambda sha: self.disk_index[sha]["created"]):
+            if total <= self.disk_max_bytes:
+                break
+            total -= self.disk_index[sha]["bytes"]
+            self._remove_disk(sha)
+
+    def _remove_disk(self, sha):
+        self.disk_index.pop(sha, None)
+        self.stats["evictions"] += 1
+        try:
+            os.remove(self._path(sha))
+        except OSError:
+            pass
+
+    def hit_rate(self):
+        hits = self.stats["hits"] + self.stats["near_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_cache(max_entries=512, ttl_seconds=604800, max_distance=4, disk_dir="", disk_max_bytes=50 * 1024 * 1024):
+    """One PredictionCache per process, shared by every session."""
+    return PredictionCache(max_entries=max_entries
+                           , ttl_seconds=ttl_seconds
+                           , max_distance=max_distance
+                           , disk_dir=disk_dir
+                           , disk_max_bytes=disk_max_bytes)
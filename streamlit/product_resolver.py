@@ -0,0 +1,80 @@
+### In-process resolver from LandingAI labels to DIM_PRODUCT rows.
+### DIM_PRODUCT is small and comes from the shared reference data, so it is indexed once per data
+### refresh: exact names, a configurable synonym table, then token overlap and character-trigram
+### similarity. A detection label resolves in microseconds instead of a Cortex Search round trip.
+
+import re
+import streamlit as st
+from item_index import tokenize
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(text):
+    return " ".join(tokenize(text))
+
+
+def trigrams(text):
+    padded = f"  {_NON_WORD.sub(' ', text.lower()).strip()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductResolver:
+    """Fuzzy label -> (PRODUCT_ID, PRODUCT_NAME, confidence) matcher over DIM_PRODUCT."""
+
+    def __init__(self, frame, synonyms=None, id_col="_ID", name_col="PRODUCT_NAME"):
+        self.names = dict(zip(frame[id_col].tolist(), frame[name_col].astype(str).tolist()))
+        self.by_name = {normalize_name(name): product_id for product_id, name in self.names.items()}
+
+        # synonym -> product id, for synonyms that point at a known product name
+        self.synonyms = {}
+        for synonym, name in (synonyms or {}).items():
+            product_id = self.by_name.get(normalize_name(name))
+            if product_id is not None:
+                self.synonyms[normalize_name(synonym)] = product_id
+
+        self.tokens = {product_id: set(tokenize(name)) for product_id, name in self.names.items()}
+        self.grams = {product_id: trigrams(name) for product_id, name in self.names.items()}
+        self.gram_products = {}
+        for product_id, grams in self.grams.items():
+            for gram in grams:
+                self.gram_products.setdefault(gram, set()).add(product_id)
+
+        self._memo = {}
+
+    def _score(self, label):
+        key = normalize_name(label)
+        if key in self.by_name:
+            return self.by_name[key], 1.0
+        if key in self.synonyms:
+            return self.synonyms[key], 0.95
+
+        tokens = set(key.split())
+        grams = trigrams(label)
+        candidates = set()
+        for gram in grams:
+            candidates |= self.gram_products.get(gram, set())
+
+        best, best_score = None, 0.0
+        for product_id in candidates:
+            name_tokens = self.tokens[product_id]
+            token_score = len(tokens & name_tokens) / len(tokens | name_tokens) if tokens else 0.0
+            gram_score = 2 * len(grams & self.grams[product_id]) / (len(grams) + len(self.grams[product_id]))
+            score = max(token_score, gram_score)
+            if score > best_score:
+                best, best_score = product_id, score
+        return best, best_score
+
+    def resolve(self, label):
+        """Return (product_id, product_name, confidence); product_id is None when nothing is similar."""
+        key = label.lower()
+        if key not in self._memo:
+            product_id, confidence = self._score(label)
+            self._memo[key] = (product_id, self.names.get(product_id), round(confidence, 3))
+        return self._memo[key]
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def get_product_resolver(_frame, version, synonyms=None):
+    """Resolver over the current DIM_PRODUCT snapshot; rebuilt when the reference data version changes."""
+    return ProductResolver(_frame, synonyms)
@@ -0,0 +1,112 @@
+### Process-wide reference data cache.
+### Tables are pulled once per process and shared by every Streamlit session; afterwards only
+### rows above the `_ID` watermark are fetched, and a full re-pull only happens when the
+### watermark moves backwards (table re-created) or the copy is older than the max staleness.
+
+import threading, time
+import pandas as pd
+import streamlit as st
+
+REFERENCE_TABLES = ["IMG_RECG.TRANSACTION", "IMG_RECG.WEBSITE_IMAGES", "IMG_RECG.DIM_PRODUCT"]
+
+
+class ReferenceTable:
+    """In-memory copy of one Snowflake table, refreshed by its _ID / _LOAD_TS watermark."""
+
+    def __init__(self, session_provider, table, refresh_interval_seconds=60, max_staleness_seconds=3600):
+        self.session_provider = session_provider
+        self.table = table
+        self.refresh_interval = refresh_interval_seconds
+        self.max_staleness = max_staleness_seconds
+
+        self.frame = None
+        self.watermark = None     # (max _ID, row count, max _LOAD_TS)
+        self.version = 0          # bumped every time the cached rows change
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "incremental_refreshes": 0, "full_reloads": 0}
+        self._lock = threading.Lock()
+
+    def _remote_watermark(self):
+        row = self.session_provider().sql(
+            f"select max(_ID), count(*), max(_LOAD_TS) from {self.table}").collect()[0]
+        return (row[0], row[1], row[2])
+
+    def _full_reload(self):
+        self.watermark = self._remote_watermark()
+        self.frame = self.session_provider().table(self.table).to_pandas()
+        self.version += 1
+        self.loaded_at = self.checked_at = time.monotonic()
+        self.stats["full_reloads"] += 1
+
+    def _incremental_refresh(self):
+        self.checked_at = time.monotonic()
+        remote = self._remote_watermark()
+        if remote == self.watermark:
+            return False
+
+        local_max_id, local_count, _ = self.watermark
+        remote_max_id, remote_count, _ = remote
+        if local_max_id is None or remote_max_id is None or remote_max_id < local_max_id or remote_count < local_count:
+            # Rows were deleted or the table was re-created: the watermark is no longer valid.
+            self._full_reload()
+            return True
+        if remote_max_id == local_max_id:
+            # Same _IDs but a newer _LOAD_TS: rows were updated in place, which an _ID delta cannot pick up.
+            self._full_reload()
+            return True
+
+        new_rows = self.session_provider().sql(
+            f"select * from {self.table} where _ID > {int(local_max_id)}").to_pandas()
+        if local_count + len(new_rows) != remote_count:
+            self._full_reload()
+            return True
+
+        self.frame = pd.concat([self.frame, new_rows], ignore_index=True)
+        self.watermark = remote
+        self.version += 1
+        self.stats["incremental_refreshes"] += 1
+        return True
+
+    def get(self):
+        """Return the cached DataFrame, refreshing it first when the refresh interval has elapsed."""
+        with self._lock:
+            now = time.monotonic()
+            if self.frame is None or now - self.loaded_at >= self.max_staleness:
+                self.stats["misses"] += 1
+                self._full_reload()
+            elif now - self.checked_at >= self.refresh_interval:
+                if self._incremental_refresh():
+                    self.stats["misses"] += 1
+                else:
+                    self.stats["hits"] += 1
+            else:
+                self.stats["hits"] += 1
+            return self.frame
+
+
+class ReferenceData:
+    """The set of reference tables shared by all sessions of one app process."""
+
+    def __init__(self, session_provider, tables=REFERENCE_TABLES, **settings):
+        self.tables = {table: ReferenceTable(session_provider, table, **settings) for table in tables}
+
+    def get(self, table):
+        return self.tables[table].get()
+
+    def version(self, table):
+        return self.tables[table].version
+
+    def watermark(self, table):
+        return self.tables[table].watermark
+
+    def stats(self):
+        return {table: dict(ref.stats, version=ref.version) for table, ref in self.tables.items()}
+
+
+@st.cache_resource(show_spinner=False)
+def get_reference_data(_session_provider, refresh_interval_seconds=60, max_staleness_seconds=3600):
+    """One ReferenceData per process; the session provider is not part of the cache key."""
+    return ReferenceData(_session_provider
+                         , refresh_interval_seconds=refresh_interval_seconds
+                         , max_staleness_seconds=max_staleness_seconds)
@@ -0,0 +1,218 @@
+### Resilience for outbound calls (Cortex REST endpoints and LandingAI).
+### Every call gets connect/read timeouts, jittered exponential retries on 429 / 5xx and transport
+### errors, and a per-endpoint circuit breaker that fails fast while the endpoint keeps failing.
+### Idempotent calls can also be hedged: a second attempt starts when the first is slow.
+### Retry, hedge and breaker counters are kept per endpoint for monitoring (endpoint_stats()).
+
+import random, threading, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+
+## Defaults, overridable through configure_resilience() with the `resilience` section of config.yaml.
+RESILIENCE_SETTINGS = {"connect_timeout_seconds": 5, "read_timeout_seconds": 60
+                       , "max_attempts": 3, "backoff_base_seconds": 0.5, "backoff_max_seconds": 8
+                       , "breaker_failure_threshold": 5, "breaker_reset_seconds": 30
+                       , "hedge_after_seconds": 0, "hedge_workers": 8}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+## Exceptions call_idempotent retries by default: timeouts and transport errors.
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, TimeoutError, ConnectionError)
+
+_breakers = {}
+_lock = threading.Lock()
+_hedge_pool = None
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+def configure_resilience(**settings):
+    """Set timeouts, retry, breaker and hedging settings for calls made from now on."""
+    RESILIENCE_SETTINGS.update({key: value for key, value in settings.items() if key in RESILIENCE_SETTINGS})
+
+
+def request_timeout():
+    """(connect, read) timeout tuple for requests."""
+    return (RESILIENCE_SETTINGS["connect_timeout_seconds"], RESILIENCE_SETTINGS["read_timeout_seconds"])
+
+
+def backoff_seconds(attempt):
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    ceiling = min(RESILIENCE_SETTINGS["backoff_max_seconds"], RESILIENCE_SETTINGS["backoff_base_seconds"] * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures; half-open (one trial call) after the reset timeout."""
+
+    def __init__(self, name, failure_threshold=5, reset_seconds=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "short_circuits": 0
+                      , "hedges": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    self.stats["short_circuits"] += 1
+                    return False
+                self.state = "half_open"
+            elif self.state == "half_open":
+                # Only the trial call goes through until it reports back.
+                self.stats["short_circuits"] += 1
+                return False
+            self.stats["calls"] += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.stats["successes"] += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.stats["failures"] += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, state=self.state, consecutive_failures=self.failures)
+
+
+def get_breaker(endpoint):
+    with _lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker(endpoint
+                                     , failure_threshold=RESILIENCE_SETTINGS["breaker_failure_threshold"]
+                                     , reset_seconds=RESILIENCE_SETTINGS["breaker_reset_seconds"])
+            _breakers[endpoint] = breaker
+        return breaker
+
+
+def endpoint_stats():
+    """Breaker state and retry / hedge counters of every endpoint called so far."""
+    with _lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+def _retry_after(resp, attempt):
+    header = resp.headers.get("Retry-After") if resp is not None else None
+    try:
+        return min(float(header), RESILIENCE_SETTINGS["backoff_max_seconds"])
+    except (TypeError, ValueError):
+        return backoff_seconds(attempt)
+
+
+def call_http(endpoint, send):
+    """
+    Call `send()` (which returns a requests.Response) with retries and the endpoint's breaker.
+    Returns the last response; raises CircuitOpenError when the breaker is open and the last
+    transport error when every attempt failed without a response.
+    """
+    breaker = get_breaker(endpoint)
+    attempts = RESILIENCE_SETTINGS["max_attempts"]
+    for attempt in range(1, attempts + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} is unavailable (circuit open), please retry shortly.")
+        try:
+            resp = send()
+        except (requests.ConnectionError, requests.Timeout):
+            breaker.record_failure()
+            if attempt == attempts:
+                raise
+            breaker.count("retries")
+            time.sleep(backoff_seconds(attempt))
+            continue
+        except Exception:
+            # Not a transport failure (e.g. a bad request raised client-side), but the outcome must
+            # still be recorded, or a half-open breaker would stay half-open forever.
+            breaker.record_success()
+            raise
+
+        if resp.status_code not in RETRY_STATUSES:
+            breaker.record_success()
+            return resp
+        breaker.record_failure()
+        if attempt == attempts:
+            return resp
+        breaker.count("retries")
+        resp.close()
+        time.sleep(_retry_after(resp, attempt))
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=RESILIENCE_SETTINGS["hedge_workers"], thread_name_prefix="hedge")
+        return _hedge_pool
+
+
+def _hedged(breaker, fn, hedge_after):
+    """Run `fn`; if it has not finished after `hedge_after` seconds, race a second copy against it."""
+    first = _get_hedge_pool().submit(fn)
+    done, _ = wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+
+    breaker.count("hedges")
+    second = _get_hedge_pool().submit(fn)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is second:
+                    breaker.count("hedge_wins")
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def call_idempotent(endpoint, fn, hedge=False, transient=TRANSIENT_ERRORS):
+    """
+    Call `fn()` with retries on `transient` exceptions and the endpoint's breaker; with `hedge`, slow
+    attempts are raced by a second copy after `hedge_after_seconds`. Only for idempotent calls.
+    Any other exception (bad request, auth) is raised at once and does not count as a breaker
+    failure, so one caller's bad key cannot open the breaker for everyone.
+    """
+    breaker = get_breaker(endpoint)
+    hedge_after = RESILIENCE_SETTINGS["hedge_after_seconds"] if hedge else 0
+    attempts = RESILIENCE_SETTINGS["max_attempts"]
+    for attempt in range(1, attempts + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} is unavailable (circuit open), please retry shortly.")
+        try:
+            result = _hedged(breaker, fn, hedge_after) if hedge_after > 0 else fn()
+        except transient:
+            breaker.record_failure()
+            if attempt == attempts:
+                raise
+            breaker.count("retries")
+            time.sleep(backoff_seconds(attempt))
+            continue
+        except Exception:
+            # The endpoint answered; like a 4xx in call_http, this closes a half-open breaker.
+            breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
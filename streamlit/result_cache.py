@@ -0,0 +1,234 @@
+### Bounded cache of generated-SQL results.
+### Entries are limited by count and by total DataFrame bytes, expire after a TTL and are dropped
+### when the TRANSACTION watermark moves. Results are fetched lazily with to_pandas_batches():
+### only the first page is pulled up front, the rest on demand, up to a configurable row cap.
+### Queries can also be submitted as asynchronous Snowpark jobs (submit / poll / cancel), so a slow
+### generated query never blocks the script thread that renders the chat. A running job is shared
+### by every session that submitted the same SQL and is only cancelled once its last owner lets go.
+
+import threading, time
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+from snowflake.snowpark.exceptions import SnowparkSQLException
+
+
+def as_subquery(query):
+    """Generated SQL made safe to wrap in SELECT ... FROM (...): no trailing ';', line comments closed."""
+    return query.strip().rstrip(";").rstrip() + "\n"
+
+
+class QueryResult:
+    """Rows fetched so far for one query, plus the batch iterator for the remaining ones."""
+
+    def __init__(self, batches, watermark, page_rows, row_cap, job=None):
+        self.batches = batches
+        self.job = job
+        self.cancelled = False
+        self.owners = set()       # sessions still waiting on the job
+        self.watermark = watermark
+        self.page_rows = page_rows
+        self.row_cap = row_cap
+        self.created = time.monotonic()
+        self.submitted_at = time.time()
+        self.elapsed_ms = None
+        self.error = None
+
+        self.frames = []
+        self.rows = 0
+        self.nbytes = 0
+        self.exhausted = batches is None
+        self._frame = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def failed(cls, error, watermark):
+        result = cls(None, watermark, 0, 0)
+        result.error = error
+        return result
+
+    @property
+    def pending(self):
+        """True while the asynchronous job has not been collected yet."""
+        return self.job is not None and not self.cancelled and not self.poll()
+
+    def poll(self):
+        """Collect the job's first page once the query has finished; True when the result is ready."""
+        with self._lock:
+            if self.job is None:
+                return True
+            if not self.job.is_done():
+                return False
+            job, self.job = self.job, None
+            try:
+                self.batches = iter(job.result())
+                self.exhausted = False
+            except SnowparkSQLException as e:
+                self.error = str(e)
+                self.exhausted = True
+            self.elapsed_ms = (time.monotonic() - self.created) * 1000
+            if self.exhausted:
+                return True
+        self.fetch_more()
+        return True
+
+    def acquire(self, owner):
+        with self._lock:
+            self.owners.add(owner)
+
+    def release(self, owner):
+        """
+        Drop `owner`'s interest in the job; the job is cancelled only when no other owner is left.
+        Returns True when the job was cancelled.
+        """
+        with self._lock:
+            self.owners.discard(owner)
+            if self.owners or self.job is None or self.job.is_done():
+                return False
+            self.job.cancel()
+            self.job = None
+            self.cancelled = True
+            self.exhausted = True
+            return True
+
+    @property
+    def capped(self):
+        return self.rows >= self.row_cap
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = pd.concat(self.frames, ignore_index=True) if self.frames else pd.DataFrame()
+        return self._frame
+
+    def fetch_more(self, rows=None):
+        """Pull batches until `rows` more rows (default: one page) are loaded or the result is exhausted."""
+        with self._lock:
+            target = min(self.rows + (rows or self.page_rows), self.row_cap)
+            while not self.exhausted and self.rows < target:
+                try:
+                    batch = next(self.batches)
+                except StopIteration:
+                    self.exhausted = True
+                    break
+                except SnowparkSQLException as e:
+                    self.error = str(e)
+                    self.exhausted = True
+                    break
+                self.frames.append(batch)
+                self.rows += len(batch)
+                self.nbytes += int(batch.memory_usage(deep=True).sum())
+                self._frame = None
+            if self.rows >= self.row_cap:
+                self.exhausted = True
+                self.batches = None
+
+
+class ResultCache:
+    """LRU of QueryResults bounded by entries and bytes, with TTL and watermark invalidation."""
+
+    def __init__(self, max_entries=64, max_bytes=256 * 1024 * 1024, ttl_seconds=900, row_cap=100000, page_rows=1000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.row_cap = row_cap
+        self.page_rows = page_rows
+        self.entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+    def _valid(self, result, watermark):
+        return result.watermark == watermark and time.monotonic() - result.created < self.ttl
+
+    def lookup(self, query, watermark):
+        """Cached result of `query`, or None when missing, expired or built on an older watermark."""
+        with self._lock:
+            result = self.entries.get(query)
+            if result is None:
+                return None
+            if not self._valid(result, watermark):
+                del self.entries[query]
+                self.stats["invalidations"] += 1
+                return None
+            self.entries.move_to_end(query)
+            self.stats["hits"] += 1
+            return result
+
+    def store(self, query, result):
+        with self._lock:
+            self.entries[query] = result
+            self.entries.move_to_end(query)
+            self.stats["misses"] += 1
+            self._evict()
+
+    def get(self, session, query, watermark):
+        """Return the cached result of `query`, running it (first page only) on a miss."""
+        result = self.lookup(query, watermark)
+        if result is not None:
+            return result
+
+        try:
+            batches = session.sql(as_subquery(query)).limit(self.row_cap).to_pandas_batches()
+            result = QueryResult(iter(batches), watermark, self.page_rows, self.row_cap)
+            result.fetch_more()
+            result.elapsed_ms = (time.monotonic() - result.created) * 1000
+        except SnowparkSQLException as e:
+            result = QueryResult.failed(str(e), watermark)
+
+        self.store(query, result)
+        return result
+
+    def submit(self, session, query, watermark, statement_params=None, owner=None):
+        """
+        Return the cached result of `query`, or submit it as an asynchronous job on a miss.
+        The returned result is `pending` until the job finishes; poll() collects its first page.
+        `owner` (a session token) is registered on the result; see QueryResult.release.
+        """
+        result = self.lookup(query, watermark)
+        if result is not None and not result.cancelled:
+            if owner is not None:
+                result.acquire(owner)
+            return result
+
+        try:
+            job = session.sql(as_subquery(query)).limit(self.row_cap).to_pandas_batches(
+                block=False, statement_params=statement_params)
+            result = QueryResult(None, watermark, self.page_rows, self.row_cap, job=job)
+        except SnowparkSQLException as e:
+            result = QueryResult.failed(str(e), watermark)
+
+        if owner is not None:
+            result.acquire(owner)
+        self.store(query, result)
+        return result
+
+    def discard(self, query, result):
+        """Forget `result` (e.g. after it was cancelled) so the next submit runs the query again."""
+        with self._lock:
+            if self.entries.get(query) is result:
+                del self.entries[query]
+
+    def total_bytes(self):
+        return sum(result.nbytes for result in self.entries.values())
+
+    def _evict(self):
+        total = self.total_bytes()
+        while self.entries and (len(self.entries) > self.max_entries or total > self.max_bytes):
+            _, result = self.entries.popitem(last=False)
+            total -= result.nbytes
+            self.stats["evictions"] += 1
+
+    def enforce_limits(self):
+        """Re-apply the byte budget after results grew through fetch_more()."""
+        with self._lock:
+            self._evict()
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache(max_entries=64, max_bytes=256 * 1024 * 1024, ttl_seconds=900, row_cap=100000, page_rows=1000):
+    """One ResultCache per process, shared by every session."""
+    return ResultCache(max_entries=max_entries
+                       , max_bytes=max_bytes
+                       , ttl_seconds=ttl_seconds
+                       , row_cap=row_cap
+                       , page_rows=page_rows)
@@ -1,12 +1,28 @@
 # Public Docs: https://docs.snowflake.com/LIMITEDACCESS/snowflake-cortex/rest-api/cortex-analyst
 
-import time, json, re, copy, yaml
+import time, json, uuid, yaml
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
 import pandas as pd
 import requests
 import streamlit as st
-from PIL import Image
-from snowflake.snowpark import Session
-from landingai.predict import Predictor
+import vision
+from api_clients import configure_http_pool
+from data_access import configure_data_access, get_session, get_session_pool, post_rest
+from resilience import CircuitOpenError, configure_resilience, endpoint_stats
+from prediction_cache import get_prediction_cache
+from tracing import Tracer, format_ts
+from result_cache import get_result_cache
+from sse_stream import ResponseBuilder, iter_cortex_events
+from log_sink import LogSink
+from reference_data import get_reference_data
+from message_store import ChatRecord, build_context
+from image_store import ImageStore
+from answer_cache import get_answer_cache
+from asset_cache import get_asset_cache, get_banner_image, onboarding_questions
+from item_history import item_history_query
+from product_resolver import get_product_resolver
+from chart_data import bar_query, bar_series, get_chart_cache, line_series, local_bar_series
 
 ### Open config.yaml file.
 with open("streamlit/config.yaml", "r") as file:
@@ -17,48 +33,100 @@ release_version = config["release"]["version"]
 
 ### Configurations
 SEMANTIC_FILE = f"{config["snowflake"]["database"]}.{config["snowflake"]["schema"]}.{config["snowflake"]["stage"]}/{config["snowflake"]["semantic_analyst_file"]}"
+SEMANTIC_LOCAL_FILE = "streamlit/semantic_analyst_file.yaml"
 CORTEX_SEARCH_SERVICE = f"{config["snowflake"]["database"]}.{config["snowflake"]["schema"]}.{config["snowflake"]["cortex_search_service"]}"
 
-### Snowflake connection
-session = Session.builder.configs(st.secrets["connections"]["snowflake"]).getOrCreate()
-st.session_state.CONN = session.connection
+### Snowflake connection: a shared, health-checked session pool, connected on first use
+configure_data_access(**config["data_access"])
 
 ## API Info
+configure_http_pool(**config["http"])
+configure_resilience(**config["resilience"])
 landingai_api = config["api_host"]["landingai_personal"]
 endpoint_id = config["endpoint"]["landingai"]
 api_key = st.secrets["LandingAI_key"]
 
+## Reference data, loaded once per process and shared by every session
+reference_data = get_reference_data(get_session, **config["reference_data"])
+
 ## Website contents
 images_path = "@IMG_RECG.INSTAGE"
-website_imgs = session.table("IMG_RECG.WEBSITE_IMAGES").to_pandas()
-banner_loc = website_imgs[website_imgs["DESCRIPTION"]=="BANNER"]["IMAGE_NAME"].values[0]
-banner_image = session.file.get_stream(f"{images_path}/BANNER/{banner_loc}" , decompress=False).read()
 
-## Transaction data
-tran_info = session.table("IMG_RECG.TRANSACTION").to_pandas()
+## Chat history: characters kept in the summary line of a collapsed message.
+HISTORY_SUMMARY_CHARS = 120
+
+## Streaming: minimum seconds between two re-renders of the partial answer.
+STREAM_RENDER_INTERVAL = 0.05
 
 ## ERROR
 err_message = None
 
 list_predicted_items = []
 
+@st.cache_resource(show_spinner=False)
+def get_log_sink():
+    """One background log writer per process, shared by every user session."""
+    return LogSink(get_session
+                   , max_queue=config["logging"]["max_queue"]
+                   , batch_size=config["logging"]["batch_size"]
+                   , flush_interval_seconds=config["logging"]["flush_interval_seconds"])
+
+@st.cache_resource(show_spinner=False)
+def get_tracer():
+    """Process-wide span collector; spans reach IMG_RECG.PERF_SPAN through the log sink."""
+    return Tracer(get_log_sink(), window=config["tracing"]["window"])
+
+def trace(name, request_id):
+    """Time stage `name` of turn `request_id`, for this session's breakdown and the rolling p50/p95."""
+    return get_tracer().span(name, request_id, st.session_state.setdefault("spans", []))
+
+def log_chat_message(request_id, role, message, suggestion=None, sql=None, confidence=None, source_request_id=None):
+    get_log_sink().write("IMG_RECG.CHAT_MESSAGE", {"REQUEST_ID": request_id
+                                                    , "ROLE": role
+                                                    , "MESSAGE": message
+                                                    , "SUGGESTION": suggestion
+                                                    , "SQL": sql
+                                                    , "CONFIDENCE": confidence
+                                                    , "SOURCE_REQUEST_ID": source_request_id})
+
+def answer_cache_key(question):
+    """Answer cache key of `question` under the current semantic model and TRANSACTION watermark."""
+    semantic_version = get_asset_cache(get_session, **config["assets"]).version(SEMANTIC_FILE, SEMANTIC_LOCAL_FILE)
+    return get_answer_cache(get_session, get_log_sink(), **config["answer_cache"]).key(
+        question, semantic_version, reference_data.watermark("IMG_RECG.TRANSACTION"))
+
 def reset_session_state():
     """Reset important session state elements."""
-    st.session_state.messages = []  # List to store conversation messages
+    st.session_state.messages = []  # List of ChatRecords, the conversation messages
     st.session_state.active_suggestion = None  # Currently selected suggestion
     st.session_state.warnings = []  # List to store warnings
     st.session_state.form_submitted = ({})  # Dictionary to store feedback submission for each request
+    st.session_state.image_stats = []  # Before/after sizes and timings of the preprocessed uploads
+    get_image_store().clear()  # Thumbnails and spilled originals of this session's uploads
+    st.session_state.spans = []  # Stage timings of this session's turns
+    st.session_state.pending_queries = {}  # message index -> (sql, result) of generated queries still running
+    st.session_state.cancelled_queries = set()  # message indexes whose queries were cancelled
+    st.session_state.expanded_messages = set()  # older message indexes the user expanded again
+
+def get_image_store():
+    """This session's ImageStore, created on first use."""
+    if "image_store" not in st.session_state:
+        st.session_state.image_store = ImageStore(**config["uploads"])
+    return st.session_state.image_store
 
 def handle_error_notifications():
     if st.session_state.get("fire_API_error_notify"):
         st.toast("An API error has occured!", icon="🚨")
         st.session_state["fire_API_error_notify"] = False
 
-def cortex_agent_call(message, limit = 10):
-
-    request_id = str(time.time())
-    cleansed_message = message[-1]["content"][0]["text"]
-    when_to_greet = [each for each in st.session_state.messages if each["role"]=="assistant"]
+def cortex_agent_call(message, limit = 10, placeholder = None, request_id = None, use_search = True):
+    """
+    Stream the agent's answer to `message`, the request messages built by build_context
+    (earlier turns for context, the new question last).
+    `use_search=False` leaves out the Cortex Search tool, for questions whose products are already resolved.
+    """
+    request_id = request_id or str(time.time())
+    when_to_greet = sum(1 for each in st.session_state.messages if each.role == "assistant")
 
     request_body = {
         "model": "llama3.1-70b",
@@ -66,17 +134,7 @@ def cortex_agent_call(message, limit = 10):
                                  If {when_to_greet} == 0, please greet with your name 'Aime'.Otherwise, say your name 'Aime' only when asked.
                                 Please always respond with a postive mood.
                                 Do not hallucinate.""",
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": cleansed_message
-                    }
-                ]
-            }
-        ],
+        "messages": message,
         "tools": [
             {
                 "tool_spec": {
@@ -101,116 +159,207 @@ def cortex_agent_call(message, limit = 10):
         }
     }
 
+    if not use_search:
+        request_body["tools"] = [each for each in request_body["tools"] if each["tool_spec"]["name"] != "search1"]
+        request_body["tool_resources"].pop("search1")
+
     ## LOG users question
-    session.sql(f"""insert into IMG_RECG.CHAT_MESSAGE(REQUEST_ID, ROLE, MESSAGE, SUGGESTION, SQL, CONFIDENCE) 
-                select '{request_id}','user', '{cleansed_message}', NULL, NULL, NULL;""").collect()
+    with trace("chat_log", request_id):
+        log_chat_message(request_id, "user", message[-1]["content"][0]["text"])
 
-    
     try:
-        resp = requests.post(
-                    url=f"https://{st.session_state.CONN.host}{config["endpoint"]["cortex_agent"]}",
-                    json=request_body,
-                    headers={
-                        "Authorization": f'Snowflake Token="{st.session_state.CONN.rest.token}"',
-                        "Content-Type": "application/json",
-                    },
-                )
-
-        #debug:
-        #st.header(resp.content)
+        with trace("agent_post", request_id):
+            resp = post_rest(config["endpoint"]["cortex_agent"], request_body, stream=True)
 
         if resp.status_code != 200:
             raise Exception(f"API call failed with status code {resp.status_code}.")
-        
-        # Gather the return.
-        response_content, request_id, error_message = parsed_response_message(resp.content, "agent", request_id)
+
+        # Render the answer into the chat bubble as the tokens land.
+        last_render = [0.0]
+        def render_text_delta(event, builder):
+            if event["type"] == "sql" and event["sql"]:
+                # Start the generated query while the rest of the answer is still streaming.
+                get_query_exec_result(event["sql"], builder.request_id or request_id)
+                return
+            if placeholder is None or event["type"] != "text":
+                return
+            now = time.perf_counter()
+            if now - last_render[0] >= STREAM_RENDER_INTERVAL:
+                placeholder.markdown(builder.full_text + "▌")
+                last_render[0] = now
+
+        # Gather the return while the stream is still being received.
+        with resp, trace("sse_parse", request_id):
+            response_content, request_id, error_message = parsed_response_message(
+                resp.iter_content(chunk_size=None), "agent", request_id, on_event=render_text_delta)
+
+        if placeholder is not None:
+            placeholder.empty()
         return response_content, request_id, error_message
 
     except Exception as e:
         st.error(f"Error Message : {str(e)}")
-        return None
+        return [], request_id, str(e)
+
+def computer_vision_prediction(image_file, api_key="", prediction_cache=None):
+    """Detected labels of one upload (see vision.computer_vision_prediction), through the shared prediction cache."""
+    if prediction_cache is None:
+        prediction_cache = get_prediction_cache(**config["prediction_cache"])
+    return vision.computer_vision_prediction(image_file, endpoint_id, api_key, prediction_cache, config["image"])
+
 
-def computer_vision_prediction(image_file, api_key=""):
-    results = []
+@st.cache_resource(show_spinner=False)
+def get_prediction_pool():
+    """Process-wide worker pool for image predictions, bounding concurrent LandingAI calls."""
+    return ThreadPoolExecutor(max_workers=config["vision"]["max_workers"], thread_name_prefix="cv-predict")
 
-    # Upload the image:
-    imagefile = Image.open(image_file)
 
-    if api_key:
-        try:
-            # Send to model for prediction,
-            predictor = Predictor(endpoint_id, api_key=api_key)
-            predictions = predictor.predict(imagefile) #ObjectDetectionPrediction Object
+def predict_images(image_files, api_key=""):
+    """
+    Run computer_vision_prediction for every image concurrently.
+    Returns one result list per image, in upload order; images that miss the timeout get a FAILURE result.
+    """
+    prediction_cache = get_prediction_cache(**config["prediction_cache"])
+    futures = [get_prediction_pool().submit(computer_vision_prediction, each, api_key, prediction_cache)
+               for each in image_files]
+    wait(futures, timeout=config["vision"]["timeout_seconds"])
+
+    all_results = []
+    for future in futures:
+        if future.done():
+            all_results.append(future.result())
+        else:
+            future.cancel()
+            all_results.append([{"status" : "FAILURE", "error_message" : "Image prediction timed out."}])
+    return all_results
+
 
-            for each in predictions:
-                results.append({"status" : "SUCCESS", "item" : each.label_name})
+def resolve_product(label):
+    """(PRODUCT_ID, PRODUCT_NAME, confidence) of a detected label, from the local DIM_PRODUCT resolver."""
+    resolver = get_product_resolver(reference_data.get("IMG_RECG.DIM_PRODUCT")
+                                    , reference_data.version("IMG_RECG.DIM_PRODUCT")
+                                    , config["product_resolver"]["synonyms"])
+    return resolver.resolve(label)
 
-        except Exception as e:
-            err_message = str(e)
-            results.append({"status" : "FAILURE", "error_message" : err_message})
 
-    return results
+def merge_predicted_items(all_results):
+    """Labels of every successful detection across all images, de-duplicated case-insensitively."""
+    seen = set()
+    items = []
+    for results in all_results:
+        for each in results:
+            if each["status"] == "SUCCESS" and each["item"].lower() not in seen:
+                seen.add(each["item"].lower())
+                items.append(each["item"])
+    return items
 
 
 def process_user_input(container_name, prompt, api_key = ""):
     # Clear previous warnings at the start of a new request
     st.session_state.warnings = []
+    request_id = str(time.time())
+
+    # The user moved on: stop the generated queries still running for earlier messages.
+    cancel_pending_queries()
 
     # Create a new message, append to history and display imidiately
-    new_user_message = None
+    images = []
+    predicted_items = []
+    use_search = True
 
     # If prompt is just text, no file attached:
     if type(prompt) == str:
-        new_user_message = {
-                        "role": "user",
-                        "content": [{"type": "text", "text": prompt}]
-                        }
+        text = prompt
     # If prompt is a file attached:
     else:
-        new_user_message = {
-                            "role": "user",
-                            "content": [{"type": "text", "text": prompt.text}]
-                            }
-        
+        text = prompt.text
+
         if prompt["files"]:
-            new_user_message["content"].append({"type": "image", "image": prompt["files"][0]})
+            # The history keeps thumbnails only; the originals are spilled to disk.
+            image_store = get_image_store()
+            images = [image_store.add(each_file) for each_file in prompt["files"]]
+
+            # Send all images to Computer Vision Tool for prediction at once.
+            with trace("image_prediction", request_id):
+                all_results = predict_images([image_store.source(key, each_file) for key, each_file in zip(images, prompt["files"])]
+                                             , api_key=api_key)
+
+            for results in all_results:
+                if results and "stats" in results[0]:
+                    st.session_state.image_stats = (st.session_state.image_stats + [results[0]["stats"]])[-5:]
+
+            # Fold every detected item into one grounded question.
+            labels = merge_predicted_items(all_results)
+            if labels:
+                # Map labels to products locally; confident matches carry their PRODUCT_ID into the question,
+                # and when every label is confident the agent does not need Cortex Search at all.
+                with trace("product_resolve", request_id):
+                    for label in labels:
+                        product_id, product_name, confidence = resolve_product(label)
+                        if product_id is not None and confidence >= config["product_resolver"]["min_confidence"]:
+                            predicted_items.append({"name": product_name, "product_id": product_id})
+                        else:
+                            predicted_items.append({"name": label, "product_id": None})
+                use_search = any(item["product_id"] is None for item in predicted_items)
 
-            # Send to Computer Vision Tool for prediction.
-            predicted_item = computer_vision_prediction(prompt["files"][0], api_key=api_key)
+                item_list = ", ".join(f"**:red[{item['name']}]**" + ("" if item["product_id"] is None else f" (PRODUCT_ID {item['product_id']})")
+                                      for item in predicted_items)
+                item_word = "item" if len(predicted_items) == 1 else "items"
+                text = text + f"( for the {item_word} {item_list} )"
 
-            if predicted_item[0]["status"] == "SUCCESS":
-                for each in new_user_message["content"]:
-                    if each["type"] == "text":
-                        each["text"] = each["text"] + f"( for the item **:red[{predicted_item[0]["item"]}]** )"
+                # The user will almost certainly look at these items' history: start fetching it now,
+                # so it runs while the agent is answering.
+                with trace("prefetch", request_id):
+                    for item in predicted_items:
+                        get_query_exec_result(item_history_query(item["name"], item["product_id"]), request_id)
 
+    new_user_message = ChatRecord.user(text, images)
     st.session_state.messages.append(new_user_message)
 
     with container_name.chat_message("user"):
         user_msg_index = len(st.session_state.messages) - 1
-        display_message(new_user_message["content"], user_msg_index)
+        display_message(new_user_message.content, user_msg_index, artifacts=get_message_artifacts(new_user_message))
 
     # Show progress indicator inside analyst chat message while waiting for response
     with container_name.chat_message("assistant"):
+        stream_placeholder = st.empty()
         with st.spinner(" Aime the bot assistant is typing...	💬"):
 
-            text_messages = copy.deepcopy(st.session_state.messages)
-
-            for each in text_messages:
-                each["content"] = list(filter(lambda x: x["type"] == "text", each["content"]))
-
-            response, request_id, error_msg = cortex_agent_call(text_messages) #get_analyst_response(text_messages)
+            # Earlier turns that fit the token budget go along as conversation memory.
+            text_messages = build_context(st.session_state.messages, **config["context"])
+
+            # Suggestion clicks and opening questions do not depend on earlier turns,
+            # so a repeat of one is answered from the shared answer cache.
+            answer_cache = get_answer_cache(get_session, get_log_sink(), **config["answer_cache"])
+            answer_key = answer_cache_key(text) if type(prompt) == str or len(text_messages) == 1 else None
+            with trace("answer_cache", request_id):
+                cached = answer_cache.get(answer_key) if answer_key else None
+
+            source_request_id = ""
+            if cached is not None:
+                # A new turn of its own: fresh request_id, the cached turn is only recorded as its source.
+                response, source_request_id, error_msg = cached["response"], cached["request_id"], None
+                log_chat_message(request_id, "user", text, source_request_id=source_request_id)
+                sql_item = next((item for item in response if item["type"] == "sql"), {})
+                log_chat_message(request_id, "assistant"
+                                 , " ".join(item["text"] for item in response if item["type"] == "text" and item.get("text"))
+                                 , [each for item in response if item["type"] == "suggestion" for each in item["suggestions"]]
+                                 , sql_item.get("sql"), sql_item.get("confidence"), source_request_id)
+            else:
+                response, request_id, error_msg = cortex_agent_call(text_messages, placeholder=stream_placeholder, request_id=request_id, use_search=use_search) #get_analyst_response(text_messages)
+                if predicted_items:
+                    response = response + [{"type": "purchase_history", "items": predicted_items}]
+                if answer_key and not error_msg and any(item["type"] == "text" for item in response):
+                    answer_cache.put(answer_key, response, request_id)
             #container_name.write(response)
 
-            analyst_message = {
-                    "role": "assistant",
-                    "content": response,
-                    "request_id": request_id,
-                }
+            analyst_message = ChatRecord.assistant(response, request_id, source_request_id)
 
             if error_msg:
                 st.session_state["fire_API_error_notify"] = True
 
             st.session_state.messages.append(analyst_message)
+            st.session_state.spans = st.session_state.spans[-config["tracing"]["session_spans"]:]
             st.rerun()
 
 
@@ -222,119 +371,25 @@ def display_warnings():
     for warning in warnings:
         st.warning(warning["message"], icon="⚠️")
 
-def parsed_response_message(content, cortex_type, request_id=""):
-
-    response_string = content.decode("utf-8")
-    removed_charactor = re.sub(r"event: [\s\w\n.:]*", "", response_string)
-    cleaned_response = removed_charactor.split("\n")
-    #DEBUG :
-    #session.sql(f"INSERT INTO RESUME_AI_DB.IMG_RECG.LOG(MESSAGE) VALUES ('{"#".join(cleaned_response)}');").collect()
-
-    wanted_response = []
-    parsed_list = []
-    error_message = None
-
-    text = []
-    sql = ""
-    suggestions = []
-    confidence = ""
-    
-    ### CORTEX AGENT
-    if cortex_type == "agent":
-        for each_response in cleaned_response:
-            if each_response:
-                try:
-                    wanted_response.append(json.loads(each_response))
-                except Exception as e:
-                    pass
-
-        #for debug
-        #session.sql(f"INSERT INTO RESUME_AI_DB.IMG_RECG.LOG(MESSAGE) VALUES ('{some_variable)}');").collect()
-        
-        for each_response in wanted_response:
-            delta_content = each_response["delta"]["content"]
-            for each in delta_content:
-                if each:
-                    try:
-                        if "text" in each:
-                            parsed_list.append(each)
-                            
-                        elif "tool_results" in each:
-                            tool_results_content = each["tool_results"]["content"]
-                            for sub_each in tool_results_content:
-                                parsed_list.append(sub_each["json"])
-                    except Exception as e:
-                        error_message = str(e)
-
-        for each in parsed_list:
-            if "suggestions" in each:
-                suggestions.append(each["suggestions"])
-
-            if "sql" in each:
-                sql = each["sql"]
-
-            if "text" in each:
-                text.append(each["text"])
-
-        rebuilt_response = [{ "type" : "text", "text" : "".join(text)}
-                            , {"type" : "suggestion", "suggestions" : suggestions}
-                            , {"type" : "sql", "sql": sql}
-                            , {"type" : "request_id", "request_id": request_id}
-                            ]
-
-    ### CORTEX ANALYST
-    elif cortex_type == "analyst":
-
-        text_delta = []
-        suggestions = []
-        messages = []
-        error_code = None
-        other = None
-
-        for each in cleaned_response:
-            if each:
-                try:
-                    parsed_list.append(json.loads(each))
-                except Exception as e:
-                    error_message = str(e)
-
-        for each in parsed_list:
-            if "text_delta" in each:
-                text_delta.append(each["text_delta"])
-            elif "suggestions_delta" in each:
-                suggestions.append(each["suggestions_delta"])
-            elif "message" in each:
-                messages.append(each["message"])
-            elif "error_code" in each:
-                error_code = each["error_code"]
-            elif "request_id" in each:
-                request_id = each["request_id"]
-            elif "type" in each and "sql" in each["type"]:
-                sql = each["statement_delta"]
-                confidence = each["confidence"]
-            #else:
-                #sql = each
-
-        if error_message:
-            text = error_message
-        else:
-            text = "".join(text_delta)
+def parsed_response_message(content, cortex_type, request_id="", on_event=None):
+    """
+    Parse a Cortex Agent / Analyst SSE body into the rebuilt response.
+    `content` may be the full body (bytes) or an iterable of chunks read from a streamed response;
+    `on_event` is called with every typed event as soon as it is decoded.
+    """
+    builder = ResponseBuilder(cortex_type, request_id)
 
-        rebuilt_response = [{ "type" : "text", "text" : text}
-                            , {"type" : "suggestion", "suggestions" : suggestions}
-                            , {"type" : "status", "messages" : messages, "error_code" : error_code}
-                            , {"type" : "sql", "sql": sql, "confidence" : confidence}
-                            , {"type" : "request_id", "request_id": request_id}
-                            ]
+    for event in iter_cortex_events(content, cortex_type):
+        builder.add(event)
+        if on_event:
+            on_event(event, builder)
 
+    rebuilt_response = builder.rebuilt_response()
+    request_id = builder.request_id
+    error_message = builder.error_message
 
-    cleansed_text = "".join(text)
-    cleansed_text = cleansed_text.replace("'","")
-    cleansed_sugg = suggestions
-    cleansed_sql = sql.replace("'","")
-    cleansed_conf = confidence.replace("'", "") if confidence else confidence
-    session.sql(f"""insert into IMG_RECG.CHAT_MESSAGE(REQUEST_ID, ROLE, MESSAGE, SUGGESTION, SQL, CONFIDENCE) 
-                select '{request_id}','assistant', '{cleansed_text}', {cleansed_sugg}, '{cleansed_sql}', '{confidence}';""").collect()
+    ## LOG assistant answer
+    log_chat_message(request_id, "assistant", builder.full_text, builder.suggestions, builder.sql, builder.confidence)
 
     return rebuilt_response, request_id, error_message
 
@@ -346,28 +401,109 @@ def get_analyst_response(messages):
         "stream": True,
     }
 
-    # Send a POST request to the Cortex Analyst API endpoint
-    # Adjusted to use positional arguments as per the API's requirement
-    resp = requests.post(
-        url=f"https://{st.session_state.CONN.host}{config["endpoint"]["cortex_analyst_message"]}",
-        json=request_body,
-        headers={
-            "Authorization": f'Snowflake Token="{st.session_state.CONN.rest.token}"',
-            "Content-Type": "application/json",
-        },
-        stream=True,
-    )
-
-    # Content is a string with serialized JSON object
-    parsed_content, request_id, error_message = parsed_response_message(resp.content, "analyst")
+    # Send a POST request to the Cortex Analyst API endpoint over the pooled keep-alive session
+    resp = post_rest(config["endpoint"]["cortex_analyst_message"], request_body, stream=True)
+
+    # Content is a stream of SSE events, parsed as the chunks arrive
+    with resp:
+        parsed_content, request_id, error_message = parsed_response_message(resp.iter_content(chunk_size=None), "analyst")
     return parsed_content, request_id, error_message
 
 
-def display_message(content, message_index, request_id=""):
+def consolidate_suggestions(item):
+    """Join the suggestion_delta word pieces of a suggestion item into complete sentences, in index order."""
+    suggestions = {}
+    for each in item["suggestions"]:
+        if "index" in each:
+            idx = each["index"]
+            suggestions[idx] = suggestions.get(idx, "") + each["suggestion_delta"]
+    return [suggestions[idx] for idx in sorted(suggestions)]
+
+
+def message_artifacts(content):
     """
-    Display a single message content.
+    Render artifacts of a message, computed once when the message is created and reused on every rerun:
+    the consolidated suggestions and a one-line summary for the collapsed history.
+    """
+    texts = [item["text"] for item in content if item["type"] == "text"]
+    summary = " ".join(" ".join(texts).split())
+    if len(summary) > HISTORY_SUMMARY_CHARS:
+        summary = summary[:HISTORY_SUMMARY_CHARS].rstrip() + "…"
+
+    badges = []
+    images = sum(1 for item in content if item["type"] == "image")
+    if images:
+        badges.append(f"🖼️ {images}")
+    if any(item["type"] == "sql" and item.get("sql") for item in content):
+        badges.append("🧮 SQL")
+
+    return {"suggestions": [consolidate_suggestions(item) for item in content if item["type"] == "suggestion"]
+            , "summary": summary
+            , "badges": badges}
+
+
+def get_message_artifacts(message):
+    """Artifacts of the ChatRecord `message`, built on first use and kept on the record."""
+    if message.artifacts is None:
+        message.artifacts = message_artifacts(message.content)
+    return message.artifacts
+
+
+def toggle_message_expanded(message_index):
+    expanded = st.session_state.setdefault("expanded_messages", set())
+    expanded.symmetric_difference_update({message_index})
+
+
+def display_message_summary(message, message_index):
+    """Lightweight stand-in for an older message: its summary line and a button to expand it."""
+    artifacts = get_message_artifacts(message)
+    st.caption(" · ".join(artifacts["badges"] + [artifacts["summary"] or "…"]))
+    st.button("Show full message", key=f"expand_{message_index}", type="tertiary"
+              , on_click=toggle_message_expanded, args=(message_index,))
+
 
+def display_history(container):
     """
+    Render the conversation: only the last `history.full_turns` turns are rendered in full, older
+    messages collapse to their summaries unless the user expanded them.
+    """
+    messages = st.session_state.messages
+    first_full = max(0, len(messages) - 2 * config["history"]["full_turns"])
+    expanded = st.session_state.setdefault("expanded_messages", set())
+    if first_full:
+        container.caption(f"{first_full} earlier message(s) collapsed")
+    if not messages:
+        display_starter_questions(container)
+
+    for idx, message in enumerate(messages):
+        with container.chat_message(message.role):
+            if idx < first_full and idx not in expanded:
+                display_message_summary(message, idx)
+                continue
+            display_message(message.content, idx, message.request_id, get_message_artifacts(message))
+            if idx < first_full:
+                st.button("Show less", key=f"collapse_{idx}", type="tertiary"
+                          , on_click=toggle_message_expanded, args=(idx,))
+
+
+def display_starter_questions(container):
+    """Onboarding questions of the locally cached semantic model, as suggestion buttons for an empty chat."""
+    try:
+        model = get_asset_cache(get_session, **config["assets"]).semantic_model(SEMANTIC_FILE, SEMANTIC_LOCAL_FILE)
+    except Exception:
+        return
+    for key, question in enumerate(onboarding_questions(model)):
+        if container.button(question, key=f"starter_{key}"):
+            st.session_state.active_suggestion = question
+
+
+def display_message(content, message_index, request_id="", artifacts=None):
+    """
+    Display a single message content.
+    `artifacts` are the message's precomputed render artifacts (see message_artifacts).
+    """
+    artifacts = artifacts or message_artifacts(content)
+    suggestion_lists = iter(artifacts["suggestions"])
     #For debug purpose
     #st.subheader(content)
 
@@ -377,43 +513,65 @@ def display_message(content, message_index, request_id=""):
                 st.markdown(item["text"])
             
             case "image":
-                st.image(item["image"], width = 200)
+                thumbnail = get_image_store().thumbnail(item["image"])
+                if thumbnail is not None:
+                    st.image(thumbnail, width = 200)
+                else:
+                    st.caption("🖼️ Image no longer kept in this session.")
 
             case "suggestion":
-                # Consolidate the suggestion_delta (word pieces) into a complete sentence.
-                suggestions = {}
-                for each in item["suggestions"]:
-                    if "index" in each:
-                        idx = each["index"]
-                        if idx in suggestions:
-                            suggestions.update({idx:suggestions[idx] + each["suggestion_delta"]})
-                        else:
-                            suggestions[idx] = each["suggestion_delta"]
-
-                # Display suggestions as buttons
-                for key, value in suggestions.items():
+                # Display the consolidated suggestions as buttons
+                for key, value in enumerate(next(suggestion_lists, [])):
                     if st.button(value, key=f"suggestion_{message_index}_{key}"):
                         st.session_state.active_suggestion = value
 
             case "sql":
                 # Display the SQL query and results
                 if item["sql"]:
-                    if "confidence" in item:
-                        display_sql_query(item["sql"], message_index, item["confidence"], request_id)
-                    else:
-                        display_sql_query(
-                            item["sql"], message_index, "", request_id)
+                    display_sql_query(item["sql"], message_index, item.get("confidence", ""), request_id)
 
+            case "purchase_history":
+                # Prefetched while the agent was answering; open when the agent gave no SQL of its own.
+                has_sql = any(each["type"] == "sql" and each.get("sql") for each in content)
+                display_purchase_history(item["items"], request_id, expanded=not has_sql)
 
 
-@st.cache_data(show_spinner=False)
-def get_query_exec_result(query):
-    global session
-    try:
-        df = session.sql(query).to_pandas()
-        return df, None
-    except SnowparkSQLException as e:
-        return None, str(e)
+def get_query_exec_result(query, request_id=""):
+    """
+    Result of a generated query from the bounded, process-wide result cache.
+    On a miss the query is submitted as an asynchronous job (tagged with the request_id and bounded by the
+    statement timeout) and the returned result stays `pending` until it finishes.
+    """
+    statement_params = {
+        "QUERY_TAG": json.dumps({"app": "snapledger", "request_id": request_id}),
+        "STATEMENT_TIMEOUT_IN_SECONDS": str(config["query_jobs"]["statement_timeout_seconds"]),
+    }
+    return get_result_cache(**config["result_cache"]).submit(
+        get_session(), query, reference_data.watermark("IMG_RECG.TRANSACTION"), statement_params, query_owner())
+
+
+def query_owner():
+    """This session's token on shared query jobs."""
+    return st.session_state.setdefault("query_owner", uuid.uuid4().hex)
+
+
+def cancel_pending_queries():
+    """
+    Stop waiting for the still-running queries of messages the user has moved past. A job shared with
+    other sessions keeps running for them; it is cancelled only when this session was its last owner.
+    """
+    result_cache = get_result_cache(**config["result_cache"])
+    for message_index, (sql, result) in st.session_state.setdefault("pending_queries", {}).items():
+        if result.pending:
+            st.session_state.setdefault("cancelled_queries", set()).add(message_index)
+        if result.release(query_owner()):
+            result_cache.discard(sql, result)
+    st.session_state.pending_queries = {}
+
+
+def load_more_rows(result):
+    result.fetch_more()
+    get_result_cache(**config["result_cache"]).enforce_limits()
 
 
 def display_sql_confidence(confidence):
@@ -432,8 +590,11 @@ def display_sql_confidence(confidence):
                 return
 
             st.text(f"Question: {verified_query_used['question']}")
-            st.text(f"Verified by: {verified_query_used['verified_by']}")
-            #st.text(f"Verified at: {datetime.fromtimestamp(verified_query_used['verified_at'])}")
+            # Both are optional in the semantic model.
+            if verified_query_used.get("verified_by"):
+                st.text(f"Verified by: {verified_query_used['verified_by']}")
+            if verified_query_used.get("verified_at"):
+                st.text(f"Verified at: {datetime.fromtimestamp(verified_query_used['verified_at'])}")
             st.text("SQL query:")
             st.code(verified_query_used["sql"], language="sql", wrap_lines=True)
 
@@ -448,25 +609,125 @@ def display_sql_query(sql, message_index, confidence, request_id):
 
     # Display the results of the SQL query
     with st.expander("Results", expanded=True):
-        with st.spinner("Running SQL..."):
-            df, err_msg = get_query_exec_result(sql)
-            if df is None:
-                st.error(f"Could not execute generated SQL query. Error: {err_msg}")
-            elif df.empty:
-                st.write("Query returned no data")
+        cancelled_queries = st.session_state.setdefault("cancelled_queries", set())
+        if message_index in cancelled_queries:
+            display_cancelled_query(message_index)
+        else:
+            result = get_query_exec_result(sql, request_id)
+            if result.pending:
+                # Poll in a fragment so the rest of the chat stays interactive while the query runs.
+                st.session_state.setdefault("pending_queries", {})[message_index] = (sql, result)
+                st.fragment(run_every=config["query_jobs"]["poll_interval_seconds"])(display_query_result)(
+                    result, sql, message_index, request_id, True)
             else:
-                # Show query results in two tabs
-                data_tab, chart_tab = st.tabs(["Data 📄", "Chart 📉"])
-                with data_tab:
-                    st.dataframe(df, use_container_width=True)
-
-                with chart_tab:
-                    display_charts_tab(df, message_index)
+                display_query_result(result, sql, message_index, request_id)
     if request_id:
         display_feedback_section(request_id)
 
 
-def display_charts_tab(df, message_index):
+def display_purchase_history(items, request_id, expanded=False):
+    with st.expander("🛒 Purchase history", expanded=expanded):
+        results = [get_query_exec_result(item_history_query(item["name"], item["product_id"]), request_id) for item in items]
+        if any(result.pending for result in results):
+            st.fragment(run_every=config["query_jobs"]["poll_interval_seconds"])(display_purchase_frames)(results, True)
+        else:
+            display_purchase_frames(results)
+
+
+def display_purchase_frames(results, polling=False):
+    if any(result.pending for result in results):
+        st.caption("⏳ Loading purchase history...")
+        return
+    if polling:
+        st.rerun()
+
+    frames = [result.frame for result in results if not result.frame.empty]
+    if frames:
+        st.dataframe(pd.concat(frames, ignore_index=True), hide_index=True, use_container_width=True)
+    else:
+        st.write("No purchases found for the detected items.")
+
+
+def display_cancelled_query(message_index):
+    st.info("The query was cancelled.", icon="⏹️")
+    if st.button("▶️ Run query again", key=f"rerun_query_{message_index}"):
+        st.session_state.cancelled_queries.discard(message_index)
+        st.rerun()
+
+
+def display_query_result(result, sql, message_index, request_id, polling=False):
+    if result.cancelled:
+        display_cancelled_query(message_index)
+        return
+
+    if result.pending:
+        st.caption("⏳ Running SQL...")
+        return
+
+    if polling:
+        # The query just finished: record its duration and redraw the page once without polling.
+        st.session_state.pending_queries.pop(message_index, None)
+        get_tracer().record("sql_exec", request_id, format_ts(result.submitted_at), result.elapsed_ms or 0
+                            , st.session_state.setdefault("spans", []))
+        st.rerun()
+
+    df = result.frame
+    if result.error and df.empty:
+        st.error(f"Could not execute generated SQL query. Error: {result.error}")
+    elif df.empty:
+        st.write("Query returned no data")
+    else:
+        # Show query results in two tabs
+        data_tab, chart_tab = st.tabs(["Data 📄", "Chart 📉"])
+        with data_tab:
+            st.dataframe(df, use_container_width=True)
+            if not result.exhausted:
+                st.button(f"Load more rows (showing {result.rows:,})"
+                          , key=f"load_more_{message_index}"
+                          , on_click=load_more_rows
+                          , args=(result,))
+            elif result.capped:
+                st.caption(f"Showing the first {result.rows:,} rows (row cap reached).")
+
+        with chart_tab:
+            display_charts_tab(result, sql, message_index, request_id)
+
+
+def chart_series(result, sql, request_id, x_col, y_col, chart_type, aggregate):
+    """
+    (prepared series, downsampled) for a chart of `result`, cached per (request_id, x, y, chart type).
+    Bars are aggregated in Snowflake unless every row is already loaded; lines are downsampled.
+    The series is None while the Snowflake aggregation is still running (submitted asynchronously).
+    """
+    charts = config["charts"]
+    df = result.frame
+    owner = request_id or sql
+    if chart_type == "line":
+        return get_chart_cache(**charts).get_or_build(
+            (owner, x_col, y_col, chart_type, result.rows)
+            , lambda: line_series(df, x_col, y_col, charts["max_points"]))
+
+    if result.exhausted and not result.capped:
+        return get_chart_cache(**charts).get_or_build(
+            (owner, x_col, y_col, chart_type, aggregate, result.rows)
+            , lambda: local_bar_series(df, x_col, y_col, aggregate, charts["max_bars"])), False
+
+    pushed = get_query_exec_result(bar_query(sql, x_col, y_col, aggregate, charts["max_bars"]), request_id)
+    if pushed.pending:
+        return None, False
+
+    def aggregate_in_snowflake():
+        if pushed.error or pushed.frame.empty:
+            return local_bar_series(df, x_col, y_col, aggregate, charts["max_bars"])
+        return bar_series(pushed.frame)
+
+    watermark = reference_data.watermark("IMG_RECG.TRANSACTION")
+    return get_chart_cache(**charts).get_or_build(
+        (owner, x_col, y_col, chart_type, aggregate, str(watermark)), aggregate_in_snowflake), False
+
+
+def display_charts_tab(result, sql, message_index, request_id=""):
+    df = result.frame
 
     # There should be at least 2 columns to draw charts
     if len(df.columns) >= 2:
@@ -480,19 +741,46 @@ def display_charts_tab(df, message_index):
             all_cols_set.difference({x_col}),
             key=f"y_col_select_{message_index}",
         )
-        chart_type = st.selectbox(
+        col3, col4 = st.columns(2)
+        chart_type = col3.selectbox(
             "Select chart type",
             options=["Line Chart 📈", "Bar Chart 📊"],
             key=f"chart_type_{message_index}",
         )
         if chart_type == "Line Chart 📈":
-            st.line_chart(df.set_index(x_col)[y_col])
+            series, downsampled = chart_series(result, sql, request_id, x_col, y_col, "line", None)
+            st.line_chart(series)
+            if downsampled:
+                st.caption(f"{len(series):,} of {result.rows:,} points shown (downsampled).")
         elif chart_type == "Bar Chart 📊":
-            st.bar_chart(df.set_index(x_col)[y_col])
+            aggregate = col4.selectbox("Aggregate", options=["sum", "avg", "min", "max", "count"]
+                                       , key=f"chart_aggregate_{message_index}")
+            series, _ = chart_series(result, sql, request_id, x_col, y_col, "bar", aggregate)
+            if series is None:
+                # Aggregating in Snowflake: poll in a fragment, like the generated query itself.
+                st.fragment(run_every=config["query_jobs"]["poll_interval_seconds"])(display_bar_chart)(
+                    result, sql, request_id, x_col, y_col, aggregate, True)
+            else:
+                display_bar_chart(result, sql, request_id, x_col, y_col, aggregate, series=series)
     else:
         st.write("At least 2 columns are required")
 
 
+def display_bar_chart(result, sql, request_id, x_col, y_col, aggregate, polling=False, series=None):
+    if series is None:
+        series, _ = chart_series(result, sql, request_id, x_col, y_col, "bar", aggregate)
+    if series is None:
+        st.caption("⏳ Aggregating...")
+        return
+    if polling:
+        # The aggregation just finished: redraw the page once without polling.
+        st.rerun()
+
+    st.bar_chart(series)
+    if len(series) >= config["charts"]["max_bars"]:
+        st.caption(f"Showing the first {len(series):,} bars.")
+
+
 def display_feedback_section(request_id):
     with st.popover("📝 Query Feedback"):
         if request_id not in st.session_state.form_submitted:
@@ -507,11 +795,16 @@ def display_feedback_section(request_id):
                 feedback_message = st.text_input("Feedback message (Optional)")
                 submitted = st.form_submit_button("Submit", disabled=submit_disabled)
                 if submitted:
-                    err_msg = submit_feedback(request_id, positive, feedback_message)
+                    # A cached answer's Cortex request belongs to another turn: its feedback stays in IMG_RECG.FEEDBACK.
+                    cached_turn = any(each.request_id == request_id and each.source_request_id
+                                      for each in st.session_state.messages)
+                    err_msg = None if cached_turn else submit_feedback(request_id, positive, feedback_message)
                     st.session_state.form_submitted[request_id] = {"error": err_msg}
                     
                     ## log feedback
-                    session.sql(f"""insert into IMG_RECG.FEEDBACK(REQUEST_ID, RATING, FEEDBACK_MESSAGE) values ('{request_id}','{positive}','{feedback_message}');""").collect()
+                    get_log_sink().write("IMG_RECG.FEEDBACK", {"REQUEST_ID": request_id
+                                                               , "RATING": str(positive)
+                                                               , "FEEDBACK_MESSAGE": feedback_message})
                     st.session_state.popover_open = False
                     st.rerun()
         elif (
@@ -530,15 +823,11 @@ def submit_feedback(request_id, positive, feedback_message):
         "feedback_message": feedback_message,
     }
 
-    resp = requests.post(
-        url=f"https://{st.session_state.CONN.host}{config["endpoint"]["cortex_analyst_feedback"]}",
-        json=request_body,
-        headers={
-            "Authorization": f'Snowflake Token="{st.session_state.CONN.rest.token}"',
-            "Content-Type": "application/json",
-        },
-        stream=True,
-    )
+    # Not streamed: the body is small and must be read so the connection goes back to the pool.
+    try:
+        resp = post_rest(config["endpoint"]["cortex_analyst_feedback"], request_body)
+    except (CircuitOpenError, requests.RequestException) as e:
+        return f"🚨 Feedback could not be sent: {e}"
 
     if resp.status_code == 200:
         return None
@@ -569,9 +858,12 @@ if __name__ == "__main__":
                         , page_title="SnapLedger"
                         , page_icon="🍭"
                         , initial_sidebar_state="expanded")
-    # Set the title and introductory text of the app
-    with st.container(border = False):
-        st.image(banner_image, width = 700, caption = release_version)
+    # Set the title and introductory text of the app; the page is already painted while Snowflake connects.
+    with st.container(border = False), st.spinner("Connecting to Snowflake..."):
+        st.image(get_banner_image(reference_data, get_asset_cache(get_session, **config["assets"]), images_path)
+                 , width = 700, caption = release_version)
+        ## Transaction data
+        tran_info = reference_data.get("IMG_RECG.TRANSACTION")
 
     with st.expander("🛒 Shopping Transactions"):
         st.dataframe(tran_info)
@@ -600,19 +892,50 @@ if __name__ == "__main__":
         st.button("🐞 Report Bugs", use_container_width=True)
         st.divider()
 
+        ## Cache statistics
+        with st.expander("📊 Cache Stats"):
+            st.caption("Reference data")
+            st.dataframe(pd.DataFrame(reference_data.stats()).T, use_container_width=True)
+            prediction_cache = get_prediction_cache(**config["prediction_cache"])
+            st.caption(f"Prediction cache (hit rate {prediction_cache.hit_rate():.0%})")
+            st.dataframe(pd.DataFrame([prediction_cache.stats]), use_container_width=True)
+            answer_cache = get_answer_cache(get_session, get_log_sink(), **config["answer_cache"])
+            st.caption(f"Answers ({len(answer_cache.entries)} cached)")
+            st.dataframe(pd.DataFrame([answer_cache.stats]), use_container_width=True)
+            result_cache = get_result_cache(**config["result_cache"])
+            st.caption(f"Query results ({len(result_cache.entries)} cached, {result_cache.total_bytes() / 1e6:.1f} MB)")
+            st.dataframe(pd.DataFrame([result_cache.stats]), use_container_width=True)
+            image_store = get_image_store()
+            st.caption(f"Uploaded images ({image_store.memory_bytes() / 1e3:.0f} KB thumbnails"
+                       f", {image_store.disk_bytes() / 1e6:.1f} MB on disk)")
+            st.dataframe(pd.DataFrame([image_store.stats]), use_container_width=True)
+            st.caption("Stage assets")
+            st.dataframe(pd.DataFrame(get_asset_cache(get_session, **config["assets"]).stats()).T, use_container_width=True)
+            if st.session_state.get("image_stats"):
+                st.caption("Image preprocessing (last uploads)")
+                st.dataframe(pd.DataFrame(st.session_state.image_stats), use_container_width=True)
+
+        ## Performance panel
+        if st.toggle("⏱️ Performance Panel"):
+            st.caption("Snowflake sessions")
+            st.dataframe(pd.DataFrame([get_session_pool().stats]), use_container_width=True)
+            st.caption("Endpoints: breaker state, retries and hedges")
+            st.dataframe(pd.DataFrame(endpoint_stats()).T, use_container_width=True)
+            spans = st.session_state.get("spans", [])
+            if spans:
+                st.caption("This session, ms per stage (latest turns)")
+                breakdown = pd.DataFrame(spans).pivot_table(index="request_id", columns="name", values="duration_ms", aggfunc="sum")
+                st.dataframe(breakdown.tail(5), use_container_width=True)
+            st.caption("Rolling p50 / p95 across sessions")
+            st.dataframe(pd.DataFrame(get_tracer().summary()).T, use_container_width=True)
+
         st.caption("by **Euphemia Zhang**")
 
     ### CHAT DISPLAY
     dialogue_box = st.container(height=300, border=False)
-    with dialogue_box:
-        for idx, message in enumerate(st.session_state.messages):
-            role = message["role"]
-            content = message["content"]
-            with dialogue_box.chat_message(role):
-                if role == "assistant":
-                    display_message(content, idx, message["request_id"])
-                else:
-                    display_message(content, idx)
+    last_request_id = next((each.request_id for each in reversed(st.session_state.messages) if each.role == "assistant"), "")
+    with dialogue_box, trace("render_history", last_request_id):
+        display_history(dialogue_box)
 
         ### CHAT AREA
         if err_message:
@@ -621,7 +944,7 @@ if __name__ == "__main__":
     # Handle chat input
 
     if user_input:= st.chat_input("What are you looking up? 👀"
-                            , accept_file=True
+                            , accept_file="multiple"
                             , file_type=["jpg", "jpeg", "png"]
                             ):
         process_user_input(dialogue_box, user_input, api_key)
@@ -0,0 +1,197 @@
+### Incremental Server-Sent Events parser for the Cortex Agent / Analyst REST streams.
+### Chunks are consumed as they arrive and turned into small typed events:
+###   {"type": "text", "text": ...}
+###   {"type": "tool_results", "json": {...}}
+###   {"type": "suggestions", "suggestions": ...}
+###   {"type": "sql", "sql": ..., "confidence": ...}
+###   {"type": "status", "status": ..., "message": ...}
+###   {"type": "request_id", "request_id": ...}
+###   {"type": "error", "message": ..., "error_code": ..., "request_id": ...}
+
+import codecs, json
+
+
+def iter_sse_lines(chunks):
+    """Split raw byte/str chunks into SSE lines without waiting for the full body."""
+    buffer = ""
+    # Incremental, so a multi-byte character split across two chunks is not mangled.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+def iter_sse_messages(lines):
+    """Group SSE lines into (event name, data) pairs, dispatching on blank lines."""
+    event = None
+    data = []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, data
+            event, data = None, []
+            continue
+        if line.startswith(":"):
+            continue
+
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+
+    if data:
+        yield event, data
+
+
+def _load_payloads(data):
+    """Decode the data lines of one SSE message; tolerate streams without blank line separators."""
+    try:
+        return [json.loads("\n".join(data))]
+    except ValueError:
+        pass
+
+    payloads = []
+    for each in data:
+        try:
+            payloads.append(json.loads(each))
+        except ValueError:
+            # e.g. the "[DONE]" sentinel.
+            pass
+    return payloads
+
+
+def decode_agent_payload(event, payload):
+    """Turn one Cortex Agent payload into typed events."""
+    if event == "error" or ("delta" not in payload and "message" in payload):
+        yield {"type": "error"
+               , "message": payload.get("message")
+               , "error_code": payload.get("code", payload.get("error_code"))
+               , "request_id": payload.get("request_id")}
+        return
+
+    for each in payload.get("delta", {}).get("content", []):
+        if not each:
+            continue
+        if "text" in each:
+            yield {"type": "text", "text": each["text"]}
+        elif "tool_results" in each:
+            for sub_each in each["tool_results"].get("content", []):
+                tool_json = sub_each.get("json")
+                if not tool_json:
+                    continue
+                yield {"type": "tool_results", "json": tool_json}
+                # One event per suggestion, shaped like the analyst's suggestions_delta pieces.
+                for idx, suggestion in enumerate(tool_json.get("suggestions") or []):
+                    if not isinstance(suggestion, dict):
+                        suggestion = {"index": idx, "suggestion_delta": str(suggestion)}
+                    yield {"type": "suggestions", "suggestions": suggestion}
+                if "sql" in tool_json:
+                    yield {"type": "sql", "sql": tool_json["sql"], "confidence": tool_json.get("confidence", "")}
+                if "text" in tool_json:
+                    yield {"type": "text", "text": tool_json["text"]}
+
+
+def decode_analyst_payload(event, payload):
+    """Turn one Cortex Analyst payload into typed events."""
+    if event == "error" or "error_code" in payload:
+        yield {"type": "error"
+               , "message": payload.get("message")
+               , "error_code": payload.get("error_code")
+               , "request_id": payload.get("request_id")}
+        return
+
+    if "text_delta" in payload:
+        yield {"type": "text", "text": payload["text_delta"]}
+    elif "suggestions_delta" in payload:
+        yield {"type": "suggestions", "suggestions": payload["suggestions_delta"]}
+    elif "message" in payload:
+        yield {"type": "status", "status": None, "message": payload["message"]}
+    elif "status" in payload:
+        yield {"type": "status", "status": payload["status"], "message": payload.get("status_message")}
+    elif "type" in payload and "sql" in payload["type"]:
+        yield {"type": "sql", "sql": payload.get("statement_delta", ""), "confidence": payload.get("confidence", "")}
+
+    # The request id may ride on any payload (e.g. the final "done" status); feedback needs it.
+    if "request_id" in payload:
+        yield {"type": "request_id", "request_id": payload["request_id"]}
+
+
+def iter_cortex_events(chunks, cortex_type):
+    """Yield typed events from a Cortex response body (bytes, or an iterable of chunks)."""
+    if isinstance(chunks, (bytes, str)):
+        chunks = [chunks]
+    decode = decode_agent_payload if cortex_type == "agent" else decode_analyst_payload
+
+    for event, data in iter_sse_messages(iter_sse_lines(chunks)):
+        if event == "done":
+            break
+        for payload in _load_payloads(data):
+            if isinstance(payload, dict):
+                yield from decode(event, payload)
+
+
+class ResponseBuilder:
+    """Assemble the rebuilt response (text, suggestions, sql...) from typed events."""
+
+    def __init__(self, cortex_type, request_id=""):
+        self.cortex_type = cortex_type
+        self.request_id = request_id
+        self.text = []
+        self.suggestions = []
+        self.sql = ""
+        self.confidence = ""
+        self.messages = []
+        self.error_code = None
+        self.error_message = None
+
+    def add(self, event):
+        match event["type"]:
+            case "text":
+                self.text.append(event["text"])
+            case "suggestions":
+                self.suggestions.append(event["suggestions"])
+            case "sql":
+                self.sql = event["sql"]
+                self.confidence = event.get("confidence") or self.confidence
+            case "status":
+                if event.get("message"):
+                    self.messages.append(event["message"])
+            case "request_id":
+                self.request_id = event["request_id"]
+            case "error":
+                self.error_message = event.get("message") or "Unknown Cortex error."
+                self.error_code = event.get("error_code")
+                if event.get("request_id"):
+                    self.request_id = event["request_id"]
+                self.messages.append(self.error_message)
+
+    @property
+    def full_text(self):
+        return "".join(self.text)
+
+    def rebuilt_response(self):
+        if self.cortex_type == "analyst":
+            text = self.full_text if self.text or not self.error_message else self.error_message
+            return [{"type" : "text", "text" : text}
+                    , {"type" : "suggestion", "suggestions" : self.suggestions}
+                    , {"type" : "status", "messages" : self.messages, "error_code" : self.error_code}
+                    , {"type" : "sql", "sql": self.sql, "confidence" : self.confidence}
+                    , {"type" : "request_id", "request_id": self.request_id}
+                    ]
+
+        return [{"type" : "text", "text" : self.full_text}
+                , {"type" : "suggestion", "suggestions" : self.suggestions}
+                , {"type" : "sql", "sql": self.sql}
+                , {"type" : "request_id", "request_id": self.request_id}
+                ]
@@ -0,0 +1,68 @@
+### Per-stage latency tracing for a chat turn.
+### Every span is tied to the turn's request_id, kept in a rolling window for p50/p95, appended to
+### the caller's session list, and shipped to IMG_RECG.PERF_SPAN through the background log sink.
+
+import threading, time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+SPAN_TABLE = "IMG_RECG.PERF_SPAN"
+
+
+def format_ts(epoch=None):
+    """UTC timestamp string for STARTED_AT; now when `epoch` is omitted."""
+    moment = datetime.now(timezone.utc) if epoch is None else datetime.fromtimestamp(epoch, timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Tracer:
+    """Process-wide span collector shared by every session."""
+
+    def __init__(self, log_sink=None, window=500):
+        self.log_sink = log_sink
+        self.window = window
+        self.durations = {}   # span name -> deque of recent durations (ms)
+        self._lock = threading.Lock()
+
+    def record(self, name, request_id, started_at, duration_ms, session_spans=None):
+        span = {"request_id": request_id
+                , "name": name
+                , "started_at": started_at
+                , "duration_ms": round(duration_ms, 3)}
+
+        with self._lock:
+            self.durations.setdefault(name, deque(maxlen=self.window)).append(duration_ms)
+        if session_spans is not None:
+            session_spans.append(span)
+        if self.log_sink is not None:
+            self.log_sink.write(SPAN_TABLE, {"REQUEST_ID": request_id
+                                             , "SPAN_NAME": name
+                                             , "STARTED_AT": started_at
+                                             , "DURATION_MS": span["duration_ms"]})
+        return span
+
+    @contextmanager
+    def span(self, name, request_id, session_spans=None):
+        """Time the enclosed block as stage `name` of turn `request_id`."""
+        started_at = format_ts()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, request_id, started_at, (time.perf_counter() - start) * 1000, session_spans)
+
+    def summary(self):
+        """Rolling count / p50 / p95 (ms) per stage."""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self.durations.items()}
+        return {name: {"n": len(values)
+                       , "p50_ms": round(percentile(values, 0.50), 3)
+                       , "p95_ms": round(percentile(values, 0.95), 3)}
+                for name, values in snapshot.items() if values}
@@ -0,0 +1,56 @@
+### LandingAI object detection of one image, shared by the Streamlit apps and the batch CLI.
+### The image is preprocessed, looked up in the prediction cache and only sent to the Predictor
+### (retried and hedged through the resilience layer) on a miss.
+
+import time
+import api_clients
+from image_prep import preprocess_image
+from resilience import call_idempotent
+
+
+def predict_labels(prepared, endpoint_id, api_key, prediction_cache=None):
+    """
+    Label names detected in a preprocessed image (see image_prep.preprocess_image).
+    Adds "cache" ("hit" / "miss") and, on a miss, "predict_seconds" to prepared["stats"].
+    """
+    fingerprint = labels = None
+    if prediction_cache is not None:
+        # Same (or nearly the same) photo seen before: reuse its labels.
+        fingerprint = prediction_cache.fingerprint(endpoint_id, prepared)
+        labels = prediction_cache.get(fingerprint)
+    prepared["stats"]["cache"] = "miss" if labels is None else "hit"
+
+    if labels is None:
+        # Send to model for prediction,
+        predictor = api_clients.get_predictor(endpoint_id, api_key)
+        predict_start = time.perf_counter()
+        # Idempotent: retried on 429 / 5xx / timeouts, and hedged when the first attempt is slow.
+        predictions = call_idempotent("landingai", lambda: predictor.predict_bytes(prepared["data"]), hedge=True
+                                      , transient=api_clients.LANDINGAI_TRANSIENT_ERRORS) #ObjectDetectionPrediction Object
+        prepared["stats"]["predict_seconds"] = round(time.perf_counter() - predict_start, 4)
+
+        labels = [each.label_name for each in predictions]
+        if prediction_cache is not None:
+            prediction_cache.put(fingerprint, labels)
+    return labels
+
+
+def computer_vision_prediction(image_file, endpoint_id, api_key="", prediction_cache=None, image_settings=None):
+    """
+    One result dict per detected label: {"status": "SUCCESS", "item", "stats"}, or a single
+    {"status": "FAILURE", "error_message"} when preprocessing or the prediction failed.
+    """
+    results = []
+
+    if api_key:
+        try:
+            # Orient, downscale and recompress the photo before the upload:
+            prepared = preprocess_image(image_file, **(image_settings or {}))
+            for label_name in predict_labels(prepared, endpoint_id, api_key, prediction_cache):
+                results.append({"status" : "SUCCESS", "item" : label_name, "stats" : prepared["stats"]})
+
+        except Exception as e:
+            err_message = str(e)
+            results.append({"status" : "FAILURE", "error_message" : err_message})
+
+    return results
@@ -0,0 +1,7 @@
+### The app modules live flat in streamlit/ and import each other as top-level modules.
+
+import os, sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+import pytest
+from PIL import Image
+from batch_recognize import BatchRun, Checkpoint, list_images
+
+
+class FakeSession:
+    def __init__(self):
+        self.written = []
+
+    def write_pandas(self, frame, table, **kwargs):
+        self.written.append((table, frame))
+
+
+def make_run(session, dry_run, failing=()):
+    """A BatchRun whose predictions are stubbed: no reference data, LandingAI or Snowflake needed."""
+    run = BatchRun.__new__(BatchRun)
+    run.session = session
+    run.config = {"batch": {"table": "BATCH_RECOGNITION", "chunk_images": 2}
+                  , "image": {"max_edge": 64, "jpeg_quality": 75}
+                  , "snowflake": {"database": "DB", "schema": "IMG_RECG"}}
+    run.args = SimpleNamespace(dry_run=dry_run, process_workers=1, predict_concurrency=2)
+    run.batch_id = "batch"
+    run.stats = {"images": 0, "skipped": 0, "failed": 0, "detections": 0, "rows_written": 0, "predict_seconds": []}
+    run.predict = lambda name, data, stats: ([run.row(name, status="FAILURE", error="boom")] if name in failing
+                                             else [run.row(name, LABEL="Granola bar")])
+    return run
+
+
+@pytest.fixture
+def images(tmp_path):
+    source = tmp_path / "receipts"
+    source.mkdir()
+    for i in range(3):
+        Image.new("RGB", (80, 60), (i * 40, 100, 100)).save(source / f"img{i}.jpg")
+    return list_images(None, str(source))
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "nested" / "run.jsonl")
+    Checkpoint(path).record(["a.jpg", "b.jpg"])
+    assert Checkpoint(path).done == {"a.jpg", "b.jpg"}
+
+
+def test_real_run_writes_and_checkpoints(tmp_path, images):
+    session, checkpoint = FakeSession(), Checkpoint(str(tmp_path / "run.jsonl"))
+    run = make_run(session, dry_run=False, failing={"img1.jpg"})
+    run.run(images, checkpoint)
+
+    assert sum(len(frame) for _, frame in session.written) == 3
+    assert run.stats["rows_written"] == 3 and run.stats["failed"] == 1
+    # Failed images are retried by the next run.
+    assert Checkpoint(checkpoint.path).done == {"img0.jpg", "img2.jpg"}
+
+    rerun = make_run(FakeSession(), dry_run=False)
+    rerun.run(images, Checkpoint(checkpoint.path))
+    assert rerun.stats["skipped"] == 2 and rerun.stats["images"] == 1
+
+
+def test_dry_run_writes_nothing_and_leaves_the_checkpoint_alone(tmp_path, images):
+    session, checkpoint = FakeSession(), Checkpoint(str(tmp_path / "run.jsonl"))
+    run = make_run(session, dry_run=True)
+    run.run(images, checkpoint)
+
+    assert run.stats["images"] == 3 and session.written == []
+    assert Checkpoint(checkpoint.path).done == set()
+
+    real = make_run(FakeSession(), dry_run=False)
+    real.run(images, Checkpoint(checkpoint.path))
+    assert real.stats["skipped"] == 0 and real.stats["rows_written"] == 3
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from chart_data import line_series, lttb
+
+
+def test_lttb_keeps_endpoints_and_threshold():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    picked = lttb(x, y, 100)
+    assert len(picked) == 100
+    assert picked[0] == 0 and picked[-1] == 999
+    assert np.all(np.diff(picked) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[321] = 100.0
+    assert 321 in lttb(x, y, 20)
+
+
+def test_lttb_short_series_untouched():
+    assert list(lttb(np.arange(5.0), np.arange(5.0), 10)) == [0, 1, 2, 3, 4]
+    assert list(lttb(np.arange(5.0), np.arange(5.0), 2)) == [0, 1, 2, 3, 4]
+
+
+def test_line_series_flags_downsampling():
+    df = pd.DataFrame({"T": range(50), "V": range(50)})
+    series, downsampled = line_series(df, "T", "V", max_points=10)
+    assert downsampled and len(series) == 10
+    assert series.index.name == "T" and series.name == "V"
+
+
+def test_line_series_dropped_rows_are_not_downsampling():
+    df = pd.DataFrame({"T": range(10), "V": [1.0, None] * 5})
+    series, downsampled = line_series(df, "T", "V", max_points=10)
+    assert not downsampled and len(series) == 5
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+from item_index import ItemIndex, normalize_token, tokenize
+
+
+@pytest.mark.parametrize("singular, plural", [
+    ("cookie", "cookies"), ("berry", "berries"), ("chip", "chips"), ("candy", "candies"),
+    ("brownie", "brownies"), ("smoothie", "smoothies"), ("box", "boxes"), ("peach", "peaches"),
+    ("cracker", "crackers"), ("toy", "toys"),
+])
+def test_singular_and_plural_share_a_stem(singular, plural):
+    assert normalize_token(singular) == normalize_token(plural)
+
+
+@pytest.mark.parametrize("word", ["glass", "hummus", "oatmeal", "bar"])
+def test_words_that_are_not_plurals_keep_their_ending(word):
+    assert normalize_token(word) == word
+
+
+def test_tokenize_lowercases_and_splits():
+    assert tokenize("Pez Candies!") == tokenize("pez candy")
+
+
+def test_lookup_matches_plural_label():
+    frame = pd.DataFrame({"ITEM": ["Chocolate chip cookie", "Oatmeal", "Chocolate chip cookie"]
+                          , "TRANSACTION_TIMESTAMP": pd.to_datetime(["2025-03-01", "2025-03-02", "2025-03-05"])
+                          , "MERCHANT_NAME": ["Metro", "Costco", "Loblaws"]
+                          , "AMOUNT": [3.5, 4.0, 3.75]})
+    index = ItemIndex(frame)
+    assert index.match_items("Chocolate Chip Cookies") == ["Chocolate chip cookie"]
+    rows, latest = index.lookup("cookies")
+    assert len(rows) == 2 and latest["MERCHANT_NAME"] == "Loblaws"
+    assert index.lookup("granola")[1] is None
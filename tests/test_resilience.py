@@ -0,0 +1,87 @@
+import time
+import pytest
+import requests
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, call_http, call_idempotent
+
+
+@pytest.fixture(autouse=True)
+def fast_settings():
+    saved = dict(resilience.RESILIENCE_SETTINGS)
+    resilience.configure_resilience(backoff_base_seconds=0.001, backoff_max_seconds=0.001
+                                    , breaker_failure_threshold=2, breaker_reset_seconds=0.05, max_attempts=2)
+    resilience._breakers.clear()
+    yield
+    resilience.RESILIENCE_SETTINGS.update(saved)
+    resilience._breakers.clear()
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker("b", failure_threshold=2, reset_seconds=0.05)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()      # only the trial call goes through
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker("b", failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_idempotent_retries_transient_errors_then_short_circuits():
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise requests.ConnectionError()
+
+    with pytest.raises(requests.ConnectionError):
+        call_idempotent("down", down)
+    assert len(calls) == 2         # both attempts failed, which opened the breaker
+    with pytest.raises(CircuitOpenError):
+        call_idempotent("down", down)
+
+
+def test_idempotent_does_not_retry_or_trip_on_other_errors():
+    calls = []
+
+    def bad_key():
+        calls.append(1)
+        raise ValueError("unauthorized")
+
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            call_idempotent("auth", bad_key)
+    assert len(calls) == 5
+    assert resilience.endpoint_stats()["auth"]["state"] == "closed"
+
+
+def test_call_http_unexpected_error_closes_half_open_breaker():
+    def down():
+        raise requests.ConnectionError()
+
+    with pytest.raises(requests.ConnectionError):
+        call_http("http", down)
+    assert resilience.endpoint_stats()["http"]["state"] == "open"
+
+    time.sleep(0.06)
+
+    def broken():
+        raise ValueError("invalid url")
+
+    with pytest.raises(ValueError):
+        call_http("http", broken)
+    assert resilience.endpoint_stats()["http"]["state"] == "closed"
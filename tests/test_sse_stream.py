@@ -0,0 +1,61 @@
+import json
+from sse_stream import ResponseBuilder, iter_cortex_events, iter_sse_lines
+
+ANALYST_STREAM = (
+    'event: status\ndata: {"status": "interpreting_question", "status_message": "Interpreting"}\n\n'
+    'event: message.content.delta\ndata: {"type": "text", "text_delta": "Granola "}\n\n'
+    'event: message.content.delta\ndata: {"type": "text", "text_delta": "bars"}\n\n'
+    'event: message.content.delta\ndata: {"type": "sql", "statement_delta": "select 1", "confidence": {"verified_query_used": null}}\n\n'
+    'event: status\ndata: {"status": "done", "request_id": "req-1"}\n\n'
+    'event: done\ndata: [DONE]\n\n'
+).encode()
+
+
+def split_every(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def test_lines_split_across_chunks():
+    chunks = [b"data: {\"a\"", b": 1}\r", b"\n\nevent: x\n", b"data: 2"]
+    assert list(iter_sse_lines(chunks)) == ['data: {"a": 1}', "", "event: x", "data: 2"]
+
+
+def test_events_do_not_depend_on_chunk_boundaries():
+    whole = list(iter_cortex_events(ANALYST_STREAM, "analyst"))
+    for size in (1, 3, 7, 64):
+        assert list(iter_cortex_events(split_every(ANALYST_STREAM, size), "analyst")) == whole
+
+
+def test_utf8_split_inside_a_character():
+    stream = 'data: {"text_delta": "café"}\n\n'.encode()
+    cut = stream.index("é".encode()) + 1
+    events = list(iter_cortex_events([stream[:cut], stream[cut:]], "analyst"))
+    assert events[0]["text"] == "café"
+
+
+def test_analyst_response_rebuilt():
+    builder = ResponseBuilder("analyst")
+    for event in iter_cortex_events(split_every(ANALYST_STREAM, 5), "analyst"):
+        builder.add(event)
+    text, _, status, sql, request_id = builder.rebuilt_response()
+    assert text["text"] == "Granola bars"
+    assert status["messages"] == ["Interpreting"]
+    assert sql["sql"] == "select 1"
+    assert request_id["request_id"] == "req-1"
+
+
+def test_analyst_error_event():
+    stream = 'event: error\ndata: {"message": "bad", "error_code": "390", "request_id": "req-2"}\n\n'
+    builder = ResponseBuilder("analyst")
+    for event in iter_cortex_events(stream, "analyst"):
+        builder.add(event)
+    assert (builder.error_code, builder.error_message, builder.request_id) == ("390", "bad", "req-2")
+
+
+def test_agent_suggestions_are_flattened():
+    payload = {"delta": {"content": [{"tool_results": {"content": [
+        {"json": {"suggestions": ["How much?", {"index": 1, "suggestion_delta": "Where?"}], "sql": "select 2"}}]}}]}}
+    events = list(iter_cortex_events(f"data: {json.dumps(payload)}\n\n", "agent"))
+    suggestions = [event["suggestions"] for event in events if event["type"] == "suggestions"]
+    assert suggestions == [{"index": 0, "suggestion_delta": "How much?"}, {"index": 1, "suggestion_delta": "Where?"}]
+    assert {"type": "sql", "sql": "select 2", "confidence": ""} in events